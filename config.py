@@ -16,11 +16,44 @@ class Settings(BaseSettings):
     
     # OpenAI
     OPENAI_MODEL: str = "gpt-4o-mini"
+    AI_CHUNK_SIZE: int = 15  # Max articles per LLM call; small chunks keep parallel calls busy
+    AI_MAX_INPUT_TOKENS: int = 16000  # Prompt budget per LLM call
+    AI_MAX_OUTPUT_TOKENS: int = 4000  # max_tokens per LLM call; chunks are packed to stay under it
+    AI_RESPONSE_FORMAT: str = "text"  # "text", "json_object" (JSON mode) or "json_schema" (structured outputs)
+    AI_MAX_CONCURRENT_CHUNKS: int = 4  # Parallel LLM calls per API key, shared by its jobs (lowered while rate limited)
+    AI_MAX_RETRIES: int = 5  # Retries per LLM call on 429/5xx/timeouts
+    AI_RETRY_BASE_DELAY: float = 1.0  # Seconds; doubled per attempt, with jitter
+    AI_RETRY_MAX_DELAY: float = 60.0  # Cap for backoff and Retry-After waits
+    LLM_CLIENT_IDLE_TIMEOUT: float = 300.0  # Seconds before an unused client is closed
+    LLM_MAX_CONNECTIONS: int = 20
+    LLM_MAX_KEEPALIVE_CONNECTIONS: int = 10
+    
+    # Classification cache
+    CLASSIFICATION_CACHE_ENABLED: bool = True
+    CLASSIFICATION_CACHE_PATH: str = "data/classification_cache.db"
+    CLASSIFICATION_CACHE_TTL_SECONDS: float = 7 * 24 * 3600
+    CLASSIFICATION_CACHE_MAX_ENTRIES: int = 50000
     
     # NewsData.io
     NEWSDATA_BASE_URL: str = "https://newsdata.io/api/1/news"
     NEWSDATA_MAX_SIZE: int = 10  # Free plan limit
     NEWSDATA_DEFAULT_MAX_PAGES: int = 10
+    NEWSDATA_HTTP2: bool = True  # Used only if the h2 package is installed
+    NEWSDATA_TIMEOUT: float = 30.0
+    NEWSDATA_MAX_CONNECTIONS: int = 50
+    NEWSDATA_MAX_KEEPALIVE_CONNECTIONS: int = 20
+    NEWSDATA_KEEPALIVE_EXPIRY: float = 60.0
+    NEWSDATA_CACHE_ENABLED: bool = True
+    NEWSDATA_CACHE_DIRECTORY: str = "data/newsdata_cache"
+    NEWSDATA_CACHE_TTL_SECONDS: float = 600.0
+    NEWSDATA_CACHE_MAX_MEMORY_ENTRIES: int = 256
+    NEWSDATA_RATE_LIMIT_ENABLED: bool = True
+    NEWSDATA_RATE_LIMIT_REQUESTS: int = 30  # Requests per window per API key (free plan: 30 / 15 min)
+    NEWSDATA_RATE_LIMIT_WINDOW_SECONDS: float = 900.0
+    NEWSDATA_RATE_LIMIT_BURST: int = 10  # Sent back-to-back; the rest of the window is paced
+    NEWSDATA_MAX_RETRIES: int = 3  # Retries on 429/5xx/connection errors
+    NEWSDATA_RETRY_BASE_DELAY: float = 2.0
+    NEWSDATA_RETRY_MAX_DELAY: float = 120.0  # Cap for backoff and Retry-After waits
     
     # Storage
     DATA_DIRECTORY: str = "data"
@@ -28,6 +61,12 @@ class Settings(BaseSettings):
     
     # Jobs
     MAX_JOBS_IN_MEMORY: int = 100
+    JOB_STORE_BACKEND: str = "file"  # "file" (results/*.json) or "sqlite"
+    JOB_STORE_SQLITE_PATH: str = "data/jobs.db"
+    RESULTS_BODY_CACHE_SIZE: int = 20  # Jobs whose articles are kept in memory
+    RESULTS_COMPACT_JSON: bool = False  # Write results without indentation
+    RESULTS_FORMAT: str = "json"  # "json" or "ndjson.gz" (gzip-compressed NDJSON)
+    SSE_HEARTBEAT_SECONDS: float = 15.0
     
     class Config:
         env_file = ".env"
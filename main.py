@@ -2,23 +2,45 @@
 AI News Agent - FastAPI Web Application
 Fetch and analyze news articles with AI-powered relevance classification
 """
-from fastapi import FastAPI, HTTPException, BackgroundTasks
+import time
+
+# Measured as early as possible so /api/health can report cold-start cost
+_IMPORT_STARTED = time.perf_counter()
+
+from fastapi import FastAPI, HTTPException, BackgroundTasks, Header, Query
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import FileResponse
+from fastapi.responses import FileResponse, Response, StreamingResponse
 from pydantic import BaseModel, Field
+from contextlib import asynccontextmanager
 from typing import Optional, List, Dict, Any
 import uuid
 import asyncio
+import itertools
+import math
 from datetime import datetime
 import logging
 import os
+import sys
+import zlib
 
 from config import settings
-from models import SearchRequest, JobStatus, JobResponse
-from services.news_fetcher import NewsFetcher
+from models import SearchRequest, JobStatus, JobSummary, JobResponse
+from services.news_fetcher import NewsFetcher, create_http_client
 from services.ai_analyzer import AIAnalyzer
-from services.job_manager import JobManager
+from services.job_manager import JobManager, STREAM_EXPORT_FORMATS
+from services.job_store import create_job_store
+from services.llm_clients import LLMClientRegistry
+from services.classification_cache import ClassificationCache
+from services.response_cache import ResponseCache
+from services.rate_limiter import RateLimiterRegistry
+from services import serialization
+from services.serialization import FastJSONResponse
+
+_IMPORTS_DONE = time.perf_counter()
+
+# Heavy modules that should only load on first use (reported by /api/health)
+DEFERRED_MODULES = ["openai", "openpyxl"]
 
 # Configure logging
 logging.basicConfig(
@@ -30,13 +52,78 @@ logger = logging.getLogger(__name__)
 # Suppress httpx logging to avoid exposing API keys in URLs
 logging.getLogger("httpx").setLevel(logging.WARNING)
 
+# Initialize services
+job_manager = JobManager(
+    store=create_job_store(
+        backend=settings.JOB_STORE_BACKEND,
+        results_dir=settings.RESULTS_DIRECTORY,
+        max_jobs=settings.MAX_JOBS_IN_MEMORY,
+        sqlite_path=settings.JOB_STORE_SQLITE_PATH,
+        body_cache_size=settings.RESULTS_BODY_CACHE_SIZE,
+        compact_json=settings.RESULTS_COMPACT_JSON,
+        results_format=settings.RESULTS_FORMAT
+    )
+)
+llm_clients = LLMClientRegistry(
+    idle_timeout=settings.LLM_CLIENT_IDLE_TIMEOUT,
+    max_connections=settings.LLM_MAX_CONNECTIONS,
+    max_keepalive_connections=settings.LLM_MAX_KEEPALIVE_CONNECTIONS,
+    max_concurrency=settings.AI_MAX_CONCURRENT_CHUNKS
+)
+classification_cache = ClassificationCache(
+    path=settings.CLASSIFICATION_CACHE_PATH,
+    ttl_seconds=settings.CLASSIFICATION_CACHE_TTL_SECONDS,
+    max_entries=settings.CLASSIFICATION_CACHE_MAX_ENTRIES
+) if settings.CLASSIFICATION_CACHE_ENABLED else None
+news_response_cache = ResponseCache(
+    directory=settings.NEWSDATA_CACHE_DIRECTORY,
+    ttl_seconds=settings.NEWSDATA_CACHE_TTL_SECONDS,
+    max_memory_entries=settings.NEWSDATA_CACHE_MAX_MEMORY_ENTRIES
+) if settings.NEWSDATA_CACHE_ENABLED else None
+news_http_client = create_http_client(
+    max_connections=settings.NEWSDATA_MAX_CONNECTIONS,
+    max_keepalive_connections=settings.NEWSDATA_MAX_KEEPALIVE_CONNECTIONS,
+    keepalive_expiry=settings.NEWSDATA_KEEPALIVE_EXPIRY,
+    timeout=settings.NEWSDATA_TIMEOUT,
+    http2=settings.NEWSDATA_HTTP2
+)
+news_rate_limiter = RateLimiterRegistry(
+    requests=settings.NEWSDATA_RATE_LIMIT_REQUESTS,
+    window_seconds=settings.NEWSDATA_RATE_LIMIT_WINDOW_SECONDS,
+    burst=settings.NEWSDATA_RATE_LIMIT_BURST
+) if settings.NEWSDATA_RATE_LIMIT_ENABLED else None
+
+
+startup_report: Dict[str, Any] = {}
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Startup/shutdown of shared resources"""
+    startup_report["import_seconds"] = round(_IMPORTS_DONE - _IMPORT_STARTED, 3)
+    startup_report["ready_seconds"] = round(time.perf_counter() - _IMPORT_STARTED, 3)
+    logger.info(
+        f"Startup: imports {startup_report['import_seconds']}s, "
+        f"ready {startup_report['ready_seconds']}s"
+    )
+    llm_clients.start()
+    yield
+    await news_http_client.aclose()
+    await llm_clients.close()
+    if classification_cache:
+        classification_cache.close()
+    job_manager.close()
+
+
 # Initialize FastAPI app
 app = FastAPI(
     title="AI News Agent API",
     description="Fetch and analyze news articles with AI-powered relevance classification",
     version="2.0.0",
     docs_url="/api/docs",
-    redoc_url="/api/redoc"
+    redoc_url="/api/redoc",
+    lifespan=lifespan,
+    default_response_class=FastJSONResponse
 )
 
 # CORS configuration
@@ -48,8 +135,7 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Initialize services
-job_manager = JobManager()
+TERMINAL_STATUSES = {"completed", "failed"}
 
 # Create necessary directories
 os.makedirs("static", exist_ok=True)
@@ -69,7 +155,11 @@ async def health_check():
     return {
         "status": "healthy",
         "timestamp": datetime.now().isoformat(),
-        "version": "2.0.0"
+        "version": "2.0.0",
+        "startup": {
+            **startup_report,
+            "deferred_modules_loaded": {name: name in sys.modules for name in DEFERRED_MODULES}
+        }
     }
 
 
@@ -89,6 +179,16 @@ async def create_search_job(
     - **openai_api_key**: OpenAI API key
     """
     try:
+        # Attach to an identical search that is still running
+        existing_job_id = job_manager.find_inflight_job(request)
+        if existing_job_id:
+            logger.info(f"Attached request for '{request.query}' to in-flight job {existing_job_id}")
+            return JobResponse(
+                job_id=existing_job_id,
+                status="processing",
+                message="Attached to identical in-flight job"
+            )
+        
         job_id = str(uuid.uuid4())
         job_manager.create_job(job_id, request)
         
@@ -113,22 +213,108 @@ async def create_search_job(
         raise HTTPException(status_code=500, detail=str(e))
 
 
-@app.get("/api/jobs/{job_id}", response_model=JobStatus)
-async def get_job_status(job_id: str):
-    """Get job status by ID"""
-    job = job_manager.get_job(job_id)
+@app.get("/api/jobs/{job_id}")
+async def get_job_status(job_id: str, fields: Optional[str] = None, include_results: bool = False):
+    """
+    Get job status by ID (results are served by /api/jobs/{job_id}/results)
+    
+    - **fields**: Comma-separated list of fields to return (e.g. `status,progress`)
+    - **include_results**: Also embed the full results list
+    """
+    if fields:
+        selected = {field.strip() for field in fields.split(",") if field.strip()}
+        unknown = selected - set(JobStatus.model_fields)
+        if unknown:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Unknown fields: {', '.join(sorted(unknown))}"
+            )
+    else:
+        selected = set(JobSummary.model_fields)
+    
+    if include_results:
+        selected.add("results")
+    
+    job = job_manager.get_job(job_id, include_results="results" in selected)
     
     if not job:
         raise HTTPException(status_code=404, detail="Job not found")
     
     logger.debug(f"Returning job status: {job.status}, progress: {job.progress}, articles: {job.total_articles}")
-    return job
+    return FastJSONResponse(job.model_dump(mode="json", include=selected))
+
+
+@app.get("/api/jobs/{job_id}/events")
+async def job_events(job_id: str):
+    """
+    Server-Sent Events stream of job progress
+    
+    Emits `status` events on every job update and `chunk` events with
+    classified articles as each analysis chunk finishes. The stream ends
+    once the job is completed, failed or deleted.
+    """
+    job = job_manager.get_job(job_id, include_results=False)
+    
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    
+    queue = job_manager.subscribe(job_id)
+    
+    def format_event(event: str, data: Dict[str, Any]) -> str:
+        return f"event: {event}\ndata: {serialization.dumps(data)}\n\n"
+    
+    async def event_stream():
+        try:
+            # Send the current state first so late subscribers are in sync
+            yield format_event("status", job.model_dump(mode="json", exclude={"results"}))
+            if job.status in TERMINAL_STATUSES:
+                return
+            
+            while True:
+                try:
+                    event, data = await asyncio.wait_for(
+                        queue.get(), timeout=settings.SSE_HEARTBEAT_SECONDS
+                    )
+                except asyncio.TimeoutError:
+                    yield ": keep-alive\n\n"
+                    continue
+                
+                yield format_event(event, data)
+                
+                if event == "deleted" or (event == "status" and data.get("status") in TERMINAL_STATUSES):
+                    return
+        finally:
+            job_manager.unsubscribe(job_id, queue)
+    
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
 
 
 @app.get("/api/jobs/{job_id}/results")
-async def get_job_results(job_id: str):
-    """Get detailed results of a completed job"""
-    job = job_manager.get_job(job_id)
+async def get_job_results(
+    job_id: str,
+    offset: int = Query(0, ge=0),
+    limit: Optional[int] = Query(None, ge=1, le=1000),
+    relevance: Optional[str] = None,
+    category: Optional[str] = None,
+    q: Optional[str] = None,
+    sort: str = "relevance",
+    format: str = "json"
+):
+    """
+    Get detailed results of a completed job
+    
+    - **offset** / **limit**: Page through results (`next_offset` is null on the last page)
+    - **relevance**: Comma-separated relevance labels to keep
+    - **category**: Keep articles in this category
+    - **q**: Keyword to match in title, description, keywords or reasoning
+    - **sort**: `relevance`, `-relevance`, `title` or `-title`
+    - **format**: `json` or `ndjson` (streams one article per line)
+    """
+    job = job_manager.get_job(job_id, include_results=False)
     
     if not job:
         raise HTTPException(status_code=404, detail="Job not found")
@@ -139,18 +325,86 @@ async def get_job_results(job_id: str):
             detail=f"Job not completed. Status: {job.status}"
         )
     
-    return {
+    if format not in ("json", "ndjson"):
+        raise HTTPException(status_code=400, detail=f"Unsupported format: {format}")
+    
+    relevance_filter = [r.strip() for r in relevance.split(",") if r.strip()] if relevance else None
+    
+    try:
+        articles = job_manager.iter_results(
+            job_id,
+            relevance=relevance_filter,
+            category=category,
+            keyword=q,
+            sort=sort
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    end = offset + limit if limit else None
+    
+    if format == "ndjson":
+        def ndjson_lines():
+            for article in itertools.islice(articles, offset, end):
+                yield serialization.dumps(article) + "\n"
+        
+        return StreamingResponse(ndjson_lines(), media_type="application/x-ndjson")
+    
+    page = []
+    total_matches = 0
+    for index, article in enumerate(articles):
+        if index >= offset and (end is None or index < end):
+            page.append(article)
+        total_matches += 1
+    
+    next_offset = end if end is not None and end < total_matches else None
+    
+    # Returned directly to skip FastAPI's jsonable_encoder pass over every article
+    return FastJSONResponse({
         "job_id": job_id,
         "query": job.query,
         "total_articles": job.total_articles,
-        "articles": job.results
-    }
+        "total_matches": total_matches,
+        "offset": offset,
+        "limit": limit,
+        "next_offset": next_offset,
+        "articles": page
+    })
+
+
+EXPORT_MEDIA_TYPES = {
+    "json": "application/json",
+    "csv": "text/csv; charset=utf-8",
+    "ndjson": "application/x-ndjson",
+    "xlsx": "application/octet-stream"
+}
+
+
+def gzip_stream(chunks):
+    """Gzip-compress a stream of text chunks on the fly"""
+    compressor = zlib.compressobj(wbits=31)  # 31 = gzip container
+    for chunk in chunks:
+        data = compressor.compress(chunk.encode("utf-8"))
+        if data:
+            yield data
+    yield compressor.flush()
 
 
 @app.get("/api/jobs/{job_id}/download")
-async def download_results(job_id: str, format: str = "json"):
-    """Download results in different formats (json, csv, xlsx)"""
-    job = job_manager.get_job(job_id)
+async def download_results(
+    job_id: str,
+    format: str = "json",
+    compress: bool = False,
+    if_none_match: Optional[str] = Header(None)
+):
+    """
+    Download results in different formats (json, csv, ndjson, xlsx)
+    
+    json, csv and ndjson are streamed row by row; set **compress** to
+    gzip the stream (Content-Encoding: gzip). Responses carry an ETag
+    tied to the results version, so unchanged exports return 304.
+    """
+    job = job_manager.get_job(job_id, include_results=False)
     
     if not job:
         raise HTTPException(status_code=404, detail="Job not found")
@@ -158,12 +412,36 @@ async def download_results(job_id: str, format: str = "json"):
     if job.status != "completed":
         raise HTTPException(status_code=400, detail="Job not completed")
     
+    if format not in EXPORT_MEDIA_TYPES:
+        raise HTTPException(status_code=400, detail=f"Unsupported format: {format}")
+    
+    filename = f"results_{job_id}.{format}"
+    etag = f'"{job_manager.results_version(job)}-{format}{"-gz" if compress else ""}"'
+    cache_headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    
+    if if_none_match and etag in [tag.strip() for tag in if_none_match.split(",")]:
+        return Response(status_code=304, headers=cache_headers)
+    
     try:
+        if format in STREAM_EXPORT_FORMATS:
+            chunks = job_manager.iter_export(job_id, format)
+            headers = {"Content-Disposition": f'attachment; filename="{filename}"', **cache_headers}
+            
+            if compress:
+                headers["Content-Encoding"] = "gzip"
+                return StreamingResponse(gzip_stream(chunks), media_type=EXPORT_MEDIA_TYPES[format], headers=headers)
+            return StreamingResponse(
+                (chunk.encode("utf-8") for chunk in chunks),
+                media_type=EXPORT_MEDIA_TYPES[format],
+                headers=headers
+            )
+        
         file_path = job_manager.export_results(job_id, format)
         return FileResponse(
             file_path,
-            media_type="application/octet-stream",
-            filename=f"results_{job_id}.{format}"
+            media_type=EXPORT_MEDIA_TYPES[format],
+            filename=filename,
+            headers=cache_headers
         )
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -194,64 +472,128 @@ async def process_news_search(job_id: str, request: SearchRequest):
         job_manager.update_job(job_id, status="fetching", progress=10)
         
         # Fetch articles
-        fetcher = NewsFetcher(api_key=request.news_api_key)
+        fetcher = NewsFetcher(
+            api_key=request.news_api_key,
+            client=news_http_client,
+            cache=news_response_cache,
+            rate_limiter=news_rate_limiter,
+            owner=job_id,
+            max_retries=settings.NEWSDATA_MAX_RETRIES,
+            retry_base_delay=settings.NEWSDATA_RETRY_BASE_DELAY,
+            retry_max_delay=settings.NEWSDATA_RETRY_MAX_DELAY
+        )
         logger.info(f"Job {job_id}: Fetching articles for '{request.query}'")
         
-        # Define progress callback to update article count in real-time
-        async def update_fetch_progress(article_count: int):
-            logger.info(f"Job {job_id}: Progress callback - updating with {article_count} articles")
+        fetched_count = 0
+        fetch_done = False
+        analysis_started = False
+        completed_chunks = 0
+        total_chunks: Optional[int] = None
+        # Used as the chunk count until the last page has been packed
+        expected_chunks = math.ceil(request.size * request.max_pages / settings.AI_CHUNK_SIZE)
+        last_progress = 10
+        
+        # Fetching fills 10% -> 50% and analysis 50% -> 95%; the two overlap, so both count as they happen
+        def report_progress(**fields):
+            nonlocal last_progress
+            fetched = 1.0 if fetch_done else min(fetched_count / (request.size * request.max_pages), 1.0)
+            chunks = total_chunks if total_chunks is not None else max(expected_chunks, completed_chunks + 1)
+            analyzed = completed_chunks / chunks if chunks else 1.0
+            last_progress = max(last_progress, min(10 + int(fetched * 40 + analyzed * 45), 95))
             job_manager.update_job(
                 job_id,
-                status="fetching",
-                progress=10 + int((article_count / (request.size * request.max_pages)) * 30),
-                total_articles=article_count
+                status="analyzing" if analysis_started or fetch_done else "fetching",
+                progress=last_progress,
+                **fields
             )
         
-        articles = await fetcher.fetch_articles(
-            query=request.query,
-            languages=request.languages,
-            categories=request.categories,
-            size=request.size,
-            max_pages=request.max_pages,
-            progress_callback=update_fetch_progress
-        )
+        # Define progress callback to update article count in real-time
+        async def update_fetch_progress(article_count: int):
+            nonlocal fetched_count
+            fetched_count = article_count
+            logger.info(f"Job {job_id}: Progress callback - updating with {article_count} articles")
+            report_progress(total_articles=article_count)
         
-        if not articles:
-            job_manager.update_job(
-                job_id,
-                status="failed",
-                error="No articles found",
-                progress=100
-            )
-            return
+        # Pages are handed to the analyzer as soon as they arrive
+        async def fetched_pages():
+            nonlocal fetch_done
+            async for page in fetcher.iter_pages(
+                query=request.query,
+                languages=request.languages,
+                categories=request.categories,
+                size=request.size,
+                max_pages=request.max_pages,
+                progress_callback=update_fetch_progress
+            ):
+                yield page
+            
+            fetch_done = True
+            if fetched_count:
+                logger.info(f"Job {job_id}: Fetched {fetched_count} articles")
+                report_progress(total_articles=fetched_count)
         
-        logger.info(f"Job {job_id}: Fetched {len(articles)} articles")
+        # Called once the first chunk is dispatched, after each chunk, and when the chunk total is known
+        async def update_analysis_progress(completed: int, total: Optional[int]):
+            nonlocal analysis_started, completed_chunks, total_chunks
+            analysis_started = True
+            completed_chunks = completed
+            total_chunks = total
+            report_progress()
         
-        # Move to analyzing phase
-        job_manager.update_job(
-            job_id,
-            status="analyzing",
-            progress=50,
-            total_articles=len(articles)
-        )
+        # Push each finished chunk to SSE watchers
+        async def publish_chunk(chunk_index: Optional[int], classified: List[Dict[str, Any]]):
+            # chunk_index is None for classifications served from the cache
+            job_manager.publish(
+                job_id, "chunk", {"chunk": chunk_index, "cached": chunk_index is None, "articles": classified}
+            )
         
-        # Analyze with AI
-        analyzer = AIAnalyzer(
+        # Analyze with AI using a pooled client
+        async with llm_clients.lease(
             api_key=request.openai_api_key,
-            model=request.model,
             base_url=request.api_base_url,
             is_azure=request.is_azure or False,
             api_version=request.api_version
-        )
+        ) as pooled:
+            analyzer = AIAnalyzer(
+                model=request.model,
+                is_azure=request.is_azure or False,
+                client=pooled.client,
+                limiter=pooled.limiter,
+                cache=classification_cache,
+                max_input_tokens=settings.AI_MAX_INPUT_TOKENS,
+                max_output_tokens=settings.AI_MAX_OUTPUT_TOKENS,
+                response_format=settings.AI_RESPONSE_FORMAT,
+                max_retries=settings.AI_MAX_RETRIES,
+                retry_base_delay=settings.AI_RETRY_BASE_DELAY,
+                retry_max_delay=settings.AI_RETRY_MAX_DELAY
+            )
+            
+            logger.info(f"Job {job_id}: Starting pipelined AI analysis")
+            classified_articles = await analyzer.analyze_stream(
+                pages=fetched_pages(),
+                query=request.query,
+                extra_topics=request.extra_topics,
+                chunk_size=settings.AI_CHUNK_SIZE,
+                max_concurrency=settings.AI_MAX_CONCURRENT_CHUNKS,
+                progress_callback=update_analysis_progress,
+                chunk_callback=publish_chunk
+            )
         
-        logger.info(f"Job {job_id}: Starting AI analysis")
-        classified_articles = await analyzer.analyze_articles(
-            articles=articles,
-            query=request.query,
-            extra_topics=request.extra_topics
-        )
+        if not fetched_count:
+            job_manager.update_job(
+                job_id,
+                status="failed",
+                error="No articles found",
+                progress=100
+            )
+            return
         
         logger.info(f"Job {job_id}: Analysis complete - {len(classified_articles)} articles classified")
+        usage = analyzer.usage
+        logger.info(
+            f"Job {job_id}: LLM usage - {usage['requests']} requests, {usage['prompt_tokens']} prompt tokens "
+            f"({usage['cached_tokens']} cached), {usage['completion_tokens']} completion tokens"
+        )
         
         # Update with results
         job_manager.update_job(
@@ -41,8 +41,8 @@ class JobResponse(BaseModel):
     status: str
     message: str
 
-class JobStatus(BaseModel):
-    """Job status model"""
+class JobSummary(BaseModel):
+    """Job status without results (cheap to poll)"""
     job_id: str
     status: str
     progress: int = Field(ge=0, le=100)
@@ -51,4 +51,7 @@ class JobStatus(BaseModel):
     query: str
     total_articles: Optional[int] = None
     error: Optional[str] = None
+
+class JobStatus(JobSummary):
+    """Job status model"""
     results: Optional[List[Dict[str, Any]]] = None
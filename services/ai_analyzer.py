@@ -1,66 +1,279 @@
 """
 AI Analyzer - Azure OpenAI integration
 """
-import openai
-from openai import AsyncAzureOpenAI
-from typing import List, Dict, Any, Optional
+from typing import AsyncIterator, List, Dict, Any, Optional, Tuple
+import asyncio
 import logging
 import json
-import re
+
+from services.backoff import RETRYABLE_STATUS_CODES, AdaptiveConcurrencyLimiter, retry_delay
+from services.classification_cache import ClassificationCache
+from services.token_budget import TokenBudgetBatcher, estimate_tokens, warm_encoding
 
 logger = logging.getLogger(__name__)
 
+# Bump whenever the prompt or output format changes so cached classifications are not reused
+PROMPT_VERSION = "3"
+
+# Follow-up requests for articles the model left out of (or garbled in) its response
+MAX_MISSING_RETRIES = 1
+
+# Output tokens per article: {"id", "relevance", "reasoning"} with a one-sentence reason
+OUTPUT_TOKENS_PER_ARTICLE = 50
+
+RELEVANCE_LABELS = ["Very Relevant", "Relevant", "Not Relevant"]
+
+# Label for articles that could not be classified (kept in results, never cached)
+UNCLASSIFIED = "Unclassified"
+
+# Errors that would fail every chunk (bad credentials, unknown model) - fail the job instead
+FATAL_STATUS_CODES = {401, 403, 404}
+
+# Article fields copied into each classification (the model only returns id/label/reasoning)
+RESULT_FIELDS = ["article_id", "title", "link", "description", "keywords", "category"]
+
+# Query-independent instructions. Kept first and byte-identical across chunks and
+# jobs so providers can serve the prompt prefix from their prompt cache; anything
+# that varies (topic, then articles) comes after it.
+SYSTEM_INSTRUCTIONS = """You are a news analyst. Analyze articles and classify their relevance to the topic given below.
+
+**Classification:**
+- **Very Relevant**: In-depth information about the topic, new developments, breakthroughs
+- **Relevant**: Mention of the topic in relevant context, but not the main topic
+- **Not Relevant**: Little to no connection to the topic
+
+Return one entry for EVERY article, using the article number as "id", in JSON format:
+```json
+{
+  "results": [
+    {"id": 1, "relevance": "Very Relevant", "reasoning": "One short sentence"}
+  ]
+}
+```"""
+
+# Structured outputs schema, used when response_format="json_schema"
+CLASSIFICATION_SCHEMA = {
+    "name": "classifications",
+    "strict": True,
+    "schema": {
+        "type": "object",
+        "properties": {
+            "results": {
+                "type": "array",
+                "items": {
+                    "type": "object",
+                    "properties": {
+                        "id": {"type": "integer"},
+                        "relevance": {"type": "string", "enum": RELEVANCE_LABELS},
+                        "reasoning": {"type": "string"}
+                    },
+                    "required": ["id", "relevance", "reasoning"],
+                    "additionalProperties": False
+                }
+            }
+        },
+        "required": ["results"],
+        "additionalProperties": False
+    }
+}
+
 class AIAnalyzer:
     """Analyze articles with OpenAI"""
     
-    def __init__(self, api_key: str, model: str = "gpt-4o-mini", base_url: Optional[str] = None, 
-                 is_azure: bool = False, api_version: Optional[str] = None):
+    def __init__(self, api_key: Optional[str] = None, model: str = "gpt-4o-mini", base_url: Optional[str] = None, 
+                 is_azure: bool = False, api_version: Optional[str] = None, client=None,
+                 cache: Optional[ClassificationCache] = None, max_input_tokens: int = 16000,
+                 max_output_tokens: int = 4000, response_format: str = "text", max_retries: int = 5,
+                 retry_base_delay: float = 1.0, retry_max_delay: float = 60.0,
+                 limiter: Optional[AdaptiveConcurrencyLimiter] = None):
         
         self.model = model
         self.is_azure = is_azure
+        self.cache = cache
+        self.max_input_tokens = max_input_tokens
+        self.max_output_tokens = max_output_tokens
+        self.response_format = response_format
+        self.max_retries = max_retries
+        self.retry_base_delay = retry_base_delay
+        self.retry_max_delay = retry_max_delay
+        # Shared per-key limiter from LLMClientRegistry; otherwise one is created per analysis run
+        self.shared_limiter = limiter
+        self.limiter = limiter or AdaptiveConcurrencyLimiter(1)
+        # Token usage across all calls, including prompt tokens served from the provider's cache
+        self.usage = {"requests": 0, "prompt_tokens": 0, "cached_tokens": 0, "completion_tokens": 0}
+        
+        if client is not None:
+            # Shared client from LLMClientRegistry
+            self.client = client
+            return
+        
+        # The openai SDK is slow to import; only load it when a client is built here
+        import openai
         
         if is_azure:
             # Azure OpenAI configuration - using base_url like the original sync version
             api_version = api_version or "2024-10-21"
             azure_base_url = base_url or "https://api.openai.com/v1"
             
-            self.client = AsyncAzureOpenAI(
+            self.client = openai.AsyncAzureOpenAI(
                 api_key=api_key,
                 base_url=azure_base_url,
-                api_version=api_version
+                api_version=api_version,
+                max_retries=0  # Retries are handled by _request_with_retry
             )
         else:
             # Standard OpenAI configuration
             if base_url:
-                self.client = openai.AsyncOpenAI(api_key=api_key, base_url=base_url)
+                self.client = openai.AsyncOpenAI(api_key=api_key, base_url=base_url, max_retries=0)
             else:
-                self.client = openai.AsyncOpenAI(api_key=api_key)
+                self.client = openai.AsyncOpenAI(api_key=api_key, max_retries=0)
     
     async def analyze_articles(
         self,
         articles: List[Dict[str, Any]],
         query: str,
         extra_topics: Optional[str] = None,
-        chunk_size: int = 15
+        chunk_size: int = 15,
+        max_concurrency: int = 1,
+        progress_callback=None,
+        chunk_callback=None
+    ) -> List[Dict[str, Any]]:
+        """Analyze a complete list of articles (see analyze_stream)"""
+        logger.info(f"Analyzing {len(articles)} articles for: {query}")
+        
+        async def single_page():
+            yield articles
+        
+        return await self.analyze_stream(
+            single_page(),
+            query,
+            extra_topics=extra_topics,
+            chunk_size=chunk_size,
+            max_concurrency=max_concurrency,
+            progress_callback=progress_callback,
+            chunk_callback=chunk_callback
+        )
+    
+    async def analyze_stream(
+        self,
+        pages: AsyncIterator[List[Dict[str, Any]]],
+        query: str,
+        extra_topics: Optional[str] = None,
+        chunk_size: int = 15,
+        max_concurrency: int = 1,
+        progress_callback=None,
+        chunk_callback=None
     ) -> List[Dict[str, Any]]:
-        """Analyze articles for relevance"""
+        """Analyze articles while pages are still being fetched
+        
+        Chunks are packed to the token budgets (at most chunk_size articles)
+        and queued as soon as they are full. The queue is bounded so fetching
+        cannot run far ahead of the analyzers. max_concurrency is the ceiling
+        for the adaptive concurrency limit (unless a shared limiter was passed
+        in), which is lowered while rate limited.
+        progress_callback receives (completed_chunks, total_chunks) when the
+        first chunk is queued, after each chunk and once the page stream is
+        exhausted; total_chunks is None until then.
+        chunk_callback receives (chunk_index, classified) for each chunk, and
+        (None, classified) for each page's classification cache hits.
+        """
         system_prompt = self._generate_system_prompt(query, extra_topics)
+        workers = max(1, max_concurrency)
+        self._reset_limiter(workers)
+        queue: asyncio.Queue = asyncio.Queue(maxsize=workers * 2)
+        chunk_results: Dict[int, List[Dict[str, Any]]] = {}
+        cached: List[Dict[str, Any]] = []
+        total_chunks: Optional[int] = None
+        completed = 0
         
-        logger.info(f"Analyzing {len(articles)} articles for: {query}")
+        logger.info(f"Streaming analysis for: {query}")
         
-        all_classified = []
+        async def dispatch(index: int, chunk: List[Dict[str, Any]]):
+            await queue.put((index, chunk))
+            if index == 0 and progress_callback:
+                await progress_callback(completed, None)
         
-        # Process in chunks
-        for i in range(0, len(articles), chunk_size):
-            chunk = articles[i:i + chunk_size]
-            logger.info(f"Processing chunk {i//chunk_size + 1} ({len(chunk)} articles)")
+        async def produce():
+            nonlocal total_chunks
+            await warm_encoding(self.model)
+            batcher = self._make_batcher(system_prompt, query, chunk_size)
+            index = 0
             
-            try:
-                classified = await self._analyze_chunk(chunk, system_prompt, query)
-                all_classified.extend(classified)
-            except Exception as e:
-                logger.error(f"Error analyzing chunk: {str(e)}")
-                continue
+            async for page in pages:
+                hits, misses = await self._split_cached(page, query, extra_topics)
+                cached.extend(hits)
+                if chunk_callback and hits:
+                    await chunk_callback(None, hits)
+                for article in misses:
+                    for chunk in batcher.add(article):
+                        await dispatch(index, chunk)
+                        index += 1
+            
+            chunk = batcher.flush()
+            if chunk:
+                await dispatch(index, chunk)
+                index += 1
+            
+            total_chunks = index
+            if progress_callback:
+                await progress_callback(completed, total_chunks)
+            for _ in range(workers):
+                await queue.put(None)
+        
+        async def consume():
+            nonlocal completed
+            while True:
+                item = await queue.get()
+                if item is None:
+                    return
+                
+                index, chunk = item
+                logger.info(f"Processing chunk {index + 1} ({len(chunk)} articles)")
+                chunk_results[index] = await self._classify_chunk(chunk, system_prompt, query, extra_topics)
+                
+                if chunk_callback and chunk_results.get(index):
+                    await chunk_callback(index, chunk_results[index])
+                
+                completed += 1
+                if progress_callback:
+                    await progress_callback(completed, total_chunks)
+        
+        tasks = [asyncio.create_task(produce())]
+        tasks += [asyncio.create_task(consume()) for _ in range(workers)]
+        try:
+            await asyncio.gather(*tasks)
+        except BaseException:
+            # Fetch or analysis failed (or we were cancelled) - stop in-flight work
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            raise
+        
+        return self._merge_results([cached] + [chunk_results[i] for i in sorted(chunk_results)])
+    
+    def _reset_limiter(self, max_concurrency: int):
+        """Per-run limiter, unless one shared across jobs on the same API key was given"""
+        if self.shared_limiter is None:
+            self.limiter = AdaptiveConcurrencyLimiter(max_concurrency)
+    
+    def _make_batcher(self, system_prompt: str, query: str, max_articles: int) -> TokenBudgetBatcher:
+        """Batcher for this analyzer's budgets, net of the fixed prompt overhead"""
+        prompt_tokens = estimate_tokens(system_prompt + self._user_prompt(""), self.model)
+        return TokenBudgetBatcher(
+            self._article_tokens,
+            max_input_tokens=max(self.max_input_tokens - prompt_tokens, 1),
+            max_output_tokens=self.max_output_tokens,
+            max_articles=max_articles
+        )
+    
+    def _article_tokens(self, article: Dict[str, Any]) -> Tuple[int, int]:
+        """Estimated (input, output) tokens for one article"""
+        input_tokens = estimate_tokens(self._format_article(1, article), self.model)
+        return input_tokens, OUTPUT_TOKENS_PER_ARTICLE
+    
+    def _merge_results(self, chunk_results: List[List[Dict[str, Any]]]) -> List[Dict[str, Any]]:
+        """Flatten chunk results (in chunk order) and sort by relevance"""
+        all_classified = [article for result in chunk_results for article in result]
         
         # Sort by relevance
         relevance_order = {"Very Relevant": 0, "Relevant": 1, "Not Relevant": 2}
@@ -69,46 +282,197 @@ class AIAnalyzer:
         logger.info(f"Classified {len(all_classified)} articles")
         return all_classified
     
+    async def _classify_chunk(
+        self,
+        articles: List[Dict[str, Any]],
+        system_prompt: str,
+        query: str,
+        extra_topics: Optional[str]
+    ) -> List[Dict[str, Any]]:
+        """Analyze a chunk, re-requesting only the articles missing from the response
+        
+        Articles that still have no classification are returned as Unclassified
+        rather than dropped. Only fatal errors (see FATAL_STATUS_CODES) propagate.
+        """
+        matched: List[Tuple[Dict[str, Any], Dict[str, Any]]] = []
+        pending = articles
+        reason = "missing from AI response"
+        
+        for attempt in range(MAX_MISSING_RETRIES + 1):
+            try:
+                response = await self._request_with_retry(pending, system_prompt)
+            except Exception as e:
+                if self._error_status(e) in FATAL_STATUS_CODES:
+                    raise
+                reason = str(e)
+                break
+            
+            found, pending = self._match_results(pending, response)
+            matched.extend(found)
+            if not pending:
+                break
+            
+            missing_ids = [article.get("article_id") or article.get("link") for article in pending]
+            logger.warning(f"{len(pending)} articles missing from AI response (attempt {attempt + 1}): {missing_ids}")
+        
+        if pending:
+            logger.error(f"Could not classify {len(pending)} articles: {reason}")
+        
+        await self._store_cached(matched, query, extra_topics)
+        return [result for _, result in matched] + [
+            self._build_result(article, UNCLASSIFIED, f"Not classified: {reason}") for article in pending
+        ]
+    
+    async def _request_with_retry(
+        self,
+        articles: List[Dict[str, Any]],
+        system_prompt: str
+    ) -> List[Dict[str, Any]]:
+        """Call _analyze_chunk under the adaptive limiter, retrying transient errors
+        
+        Waits for Retry-After when the provider sends it, otherwise uses jittered
+        exponential backoff. Rate limits (429) also lower the concurrency limit.
+        """
+        attempt = 0
+        while True:
+            async with self.limiter:
+                try:
+                    result = await self._analyze_chunk(articles, system_prompt)
+                except Exception as e:
+                    if attempt >= self.max_retries or not self._is_retryable(e):
+                        raise
+                    
+                    status = self._error_status(e)
+                    if status == 429:
+                        self.limiter.on_throttle()
+                    
+                    failure = status or type(e).__name__
+                    response = getattr(e, "response", None)
+                    delay = retry_delay(
+                        attempt, getattr(response, "headers", None), self.retry_base_delay, self.retry_max_delay
+                    )
+                else:
+                    self.limiter.on_success()
+                    return result
+            
+            # Sleep outside the limiter so other chunks can use the slot
+            attempt += 1
+            logger.warning(f"LLM request failed ({failure}), retry {attempt}/{self.max_retries} in {delay:.1f}s")
+            await asyncio.sleep(delay)
+    
+    def _error_status(self, error: Exception) -> Optional[int]:
+        """HTTP status of an API error, if any"""
+        return getattr(error, "status_code", None)
+    
+    def _is_retryable(self, error: Exception) -> bool:
+        """Rate limits, timeouts, connection failures and server errors"""
+        status = self._error_status(error)
+        if status is not None:
+            return status in RETRYABLE_STATUS_CODES
+        
+        import openai  # Already loaded whenever a real client exists
+        return isinstance(error, (openai.APIConnectionError, asyncio.TimeoutError))
+    
+    def _match_results(
+        self,
+        articles: List[Dict[str, Any]],
+        classified: List[Dict[str, Any]]
+    ) -> Tuple[List[Tuple[Dict[str, Any], Dict[str, Any]]], List[Dict[str, Any]]]:
+        """Join classifications back onto the articles they were sent as
+        
+        The model refers to articles by their 1-based position in the prompt.
+        Returns ((article, result) pairs, articles with no usable classification).
+        Unknown or duplicate ids are ignored.
+        """
+        by_id: Dict[int, Dict[str, Any]] = {}
+        for item in classified:
+            try:
+                article_number = int(item.get("id"))
+            except (TypeError, ValueError):
+                continue
+            if item.get("relevance") in RELEVANCE_LABELS:
+                by_id.setdefault(article_number, item)
+        
+        matched, missing = [], []
+        for idx, article in enumerate(articles, 1):
+            item = by_id.get(idx)
+            if item is None:
+                missing.append(article)
+                continue
+            
+            matched.append((article, self._build_result(article, item["relevance"], item.get("reasoning", ""))))
+        
+        return matched, missing
+    
+    def _build_result(self, article: Dict[str, Any], relevance: str, reasoning: str) -> Dict[str, Any]:
+        """Classification record: the article's RESULT_FIELDS plus label and reasoning"""
+        result = {field: article.get(field) for field in RESULT_FIELDS}
+        result["relevance"] = relevance
+        result["reasoning"] = reasoning
+        return result
+    
+    async def _split_cached(
+        self,
+        articles: List[Dict[str, Any]],
+        query: str,
+        extra_topics: Optional[str]
+    ) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+        """Split articles into cached classifications and cache misses"""
+        if not self.cache or not articles:
+            return [], articles
+        
+        keys = [
+            self.cache.make_key(article, query, extra_topics, self.model, PROMPT_VERSION)
+            for article in articles
+        ]
+        # SQLite reads (and last_access updates) run off the event loop
+        found = await asyncio.to_thread(self.cache.get_many, [key for key in keys if key])
+        
+        hits, misses = [], []
+        for article, key in zip(articles, keys):
+            if key and key in found:
+                hits.append(found[key])
+            else:
+                misses.append(article)
+        
+        if hits:
+            logger.info(f"Classification cache: {len(hits)} hits, {len(misses)} misses")
+        return hits, misses
+    
+    async def _store_cached(
+        self,
+        matched: List[Tuple[Dict[str, Any], Dict[str, Any]]],
+        query: str,
+        extra_topics: Optional[str]
+    ):
+        """Cache (article, classification) pairs"""
+        if not self.cache or not matched:
+            return
+        
+        items = {}
+        for article, result in matched:
+            key = self.cache.make_key(article, query, extra_topics, self.model, PROMPT_VERSION)
+            if key:
+                items[key] = result
+        
+        await asyncio.to_thread(self.cache.put_many, items)
+    
     def _generate_system_prompt(self, query: str, extra_topics: Optional[str]) -> str:
-        """Generate dynamic prompt"""
-        extra_info = f" Additional topics: {extra_topics}" if extra_topics else ""
+        """Generate prompt: static instructions, then the topic"""
+        extra_info = f"\nAdditional topics: {extra_topics}" if extra_topics else ""
         
-        return f"""You are a news analyst for {query}. Analyze articles and classify their relevance.{extra_info}
-
-**Classification:**
-- **Very Relevant**: In-depth information about {query}, new developments, breakthroughs
-- **Relevant**: Mention of {query} in relevant context, but not the main topic
-- **Not Relevant**: Little to no connection to {query}
+        return f"""{SYSTEM_INSTRUCTIONS}
 
-Return ALL articles in JSON format:
-```json
-[
-  {{
-    "article_id": "id",
-    "title": "...",
-    "link": "...",
-    "description": "...",
-    "keywords": [...],
-    "category": [...],
-    "relevance": "Very Relevant",
-    "reasoning": "..."
-  }}
-]
-```"""
+Topic: {query}{extra_info}"""
     
     async def _analyze_chunk(
         self,
         articles: List[Dict[str, Any]],
-        system_prompt: str,
-        query: str
+        system_prompt: str
     ) -> List[Dict[str, Any]]:
         """Analyze a chunk of articles"""
         
-        articles_text = self._format_articles(articles)
-        
-        user_prompt = f"""Analyze these articles for the topic "{query}":
-
-{articles_text}"""
+        user_prompt = self._user_prompt(self._format_articles(articles))
         
         try:
             response = await self.client.chat.completions.create(
@@ -118,9 +482,15 @@ Return ALL articles in JSON format:
                     {"role": "user", "content": user_prompt}
                 ],
                 temperature=0.3,
-                max_tokens=4000
+                max_tokens=self.max_output_tokens,
+                **self._response_format_kwargs()
             )
             
+            self._record_usage(response)
+            
+            if response.choices[0].finish_reason == "length":
+                logger.warning(f"AI response truncated at {self.max_output_tokens} tokens ({len(articles)} articles)")
+            
             response_text = response.choices[0].message.content
             if not response_text:
                 logger.error("Empty response from AI")
@@ -134,40 +504,91 @@ Return ALL articles in JSON format:
             logger.error(f"OpenAI API error: {str(e)}")
             raise
     
+    def _response_format_kwargs(self) -> Dict[str, Any]:
+        """JSON mode / structured outputs, if enabled (not every endpoint supports them)"""
+        if self.response_format == "json_object":
+            return {"response_format": {"type": "json_object"}}
+        if self.response_format == "json_schema":
+            return {"response_format": {"type": "json_schema", "json_schema": CLASSIFICATION_SCHEMA}}
+        return {}
+    
+    def _user_prompt(self, articles_text: str) -> str:
+        """User message for a chunk (the topic is already in the system prompt)"""
+        return f"""Articles:
+
+{articles_text}"""
+    
+    def _record_usage(self, response):
+        """Accumulate token usage; cached_tokens shows how much of the prompt hit the provider cache"""
+        usage = getattr(response, "usage", None)
+        if usage is None:
+            return
+        
+        details = getattr(usage, "prompt_tokens_details", None)
+        self.usage["requests"] += 1
+        self.usage["prompt_tokens"] += usage.prompt_tokens or 0
+        self.usage["completion_tokens"] += usage.completion_tokens or 0
+        self.usage["cached_tokens"] += getattr(details, "cached_tokens", None) or 0
+    
     def _format_articles(self, articles: List[Dict[str, Any]]) -> str:
         """Format articles for prompt"""
-        formatted = []
-        for idx, article in enumerate(articles, 1):
-            title = article.get("title", "No Title")
-            link = article.get("link", "No Link")
-            description = article.get("description", "No Description")
-            keywords = article.get("keywords", [])
-            category = article.get("category", [])
-            
-            keywords_str = ", ".join(keywords) if isinstance(keywords, list) else str(keywords)
-            category_str = ", ".join(category) if isinstance(category, list) else str(category)
-            
-            formatted.append(f"""Article {idx}:
+        return "\n".join(self._format_article(idx, article) for idx, article in enumerate(articles, 1))
+    
+    def _format_article(self, idx: int, article: Dict[str, Any]) -> str:
+        """Format a single article for prompt"""
+        title = article.get("title", "No Title")
+        link = article.get("link", "No Link")
+        description = article.get("description", "No Description")
+        keywords = article.get("keywords", [])
+        category = article.get("category", [])
+        
+        keywords_str = ", ".join(keywords) if isinstance(keywords, list) else str(keywords)
+        category_str = ", ".join(category) if isinstance(category, list) else str(category)
+        
+        return f"""Article {idx}:
 Title: {title}
 Link: {link}
 Description: {description}
 Keywords: {keywords_str}
 Category: {category_str}
-""")
-        
-        return "\n".join(formatted)
+"""
     
     def _extract_json(self, response_text: str) -> List[Dict[str, Any]]:
-        """Extract JSON from AI response"""
-        try:
-            json_match = re.search(r'\[.*\]', response_text, re.DOTALL)
-            if json_match:
-                json_str = json_match.group(0)
-                articles = json.loads(json_str)
-                return articles
-            else:
-                articles = json.loads(response_text)
-                return articles
-        except json.JSONDecodeError as e:
-            logger.error(f"JSON parse error: {str(e)}")
+        """Extract article objects from AI response
+        
+        Each object is decoded on its own, so a malformed or truncated entry
+        only loses that article instead of the whole chunk.
+        """
+        decoder = json.JSONDecoder()
+        articles: List[Dict[str, Any]] = []
+        malformed = 0
+        
+        pos = response_text.find("{")
+        while pos != -1:
+            try:
+                obj, end = decoder.raw_decode(response_text, pos)
+            except json.JSONDecodeError:
+                malformed += 1
+                pos = response_text.find("{", pos + 1)
+                continue
+            
+            articles.extend(self._article_objects(obj))
+            pos = response_text.find("{", end)
+        
+        if malformed:
+            logger.warning(f"Skipped {malformed} malformed JSON objects in AI response")
+        return articles
+    
+    def _article_objects(self, obj: Any) -> List[Dict[str, Any]]:
+        """Unwrap classification objects from a decoded value (e.g. {"results": [...]})"""
+        if not isinstance(obj, dict):
             return []
+        if "relevance" in obj:
+            return [obj]
+        
+        nested = []
+        for value in obj.values():
+            if isinstance(value, list):
+                for item in value:
+                    nested.extend(self._article_objects(item))
+        return nested
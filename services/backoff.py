@@ -0,0 +1,97 @@
+"""
+Backoff - Retry delays, Retry-After parsing and adaptive (AIMD) concurrency
+"""
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import Any, Mapping, Optional
+import asyncio
+import logging
+import random
+import time
+
+logger = logging.getLogger(__name__)
+
+# HTTP statuses worth retrying: timeouts, conflicts, rate limits and server errors
+RETRYABLE_STATUS_CODES = {408, 409, 429, 500, 502, 503, 504}
+
+
+def backoff_delay(attempt: int, base_delay: float = 1.0, max_delay: float = 60.0) -> float:
+    """Exponential backoff with full jitter for the given (0-based) attempt"""
+    return random.uniform(0, min(max_delay, base_delay * (2 ** attempt)))
+
+
+def retry_after_seconds(headers: Optional[Mapping[str, Any]]) -> Optional[float]:
+    """Parse retry-after-ms / Retry-After (seconds or HTTP date); None if absent"""
+    if not headers:
+        return None
+
+    try:
+        retry_after_ms = headers.get("retry-after-ms")
+        if retry_after_ms is not None:
+            return max(0.0, float(retry_after_ms) / 1000)
+    except (TypeError, ValueError):
+        pass
+
+    retry_after = headers.get("retry-after")
+    if retry_after is None:
+        return None
+
+    try:
+        return max(0.0, float(retry_after))
+    except (TypeError, ValueError):
+        pass
+
+    try:
+        retry_at = parsedate_to_datetime(retry_after)
+        return max(0.0, (retry_at - datetime.now(timezone.utc)).total_seconds())
+    except (TypeError, ValueError):
+        return None
+
+
+def retry_delay(attempt: int, headers: Optional[Mapping[str, Any]] = None,
+                base_delay: float = 1.0, max_delay: float = 60.0) -> float:
+    """Server-requested delay if any (plus jitter), else jittered exponential backoff"""
+    retry_after = retry_after_seconds(headers)
+    if retry_after is None:
+        return backoff_delay(attempt, base_delay, max_delay)
+
+    # Jitter keeps callers throttled at the same moment from retrying in lockstep
+    return min(max_delay, retry_after + random.uniform(0, base_delay))
+
+
+class AdaptiveConcurrencyLimiter:
+    """AIMD concurrency limit: grows by ~1 per limit successes, halves when throttled"""
+
+    def __init__(self, max_limit: int, min_limit: int = 1, decrease_cooldown: float = 2.0):
+        self.max_limit = max(1, max_limit)
+        self.min_limit = max(1, min(min_limit, self.max_limit))
+        self.decrease_cooldown = decrease_cooldown
+        self.limit = float(self.max_limit)
+        self._in_flight = 0
+        self._last_decrease = 0.0
+        self._condition = asyncio.Condition()
+
+    async def __aenter__(self):
+        async with self._condition:
+            await self._condition.wait_for(lambda: self._in_flight < int(self.limit))
+            self._in_flight += 1
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        async with self._condition:
+            self._in_flight -= 1
+            self._condition.notify_all()
+
+    def on_success(self):
+        """Additive increase"""
+        self.limit = min(float(self.max_limit), self.limit + 1 / self.limit)
+
+    def on_throttle(self):
+        """Multiplicative decrease (once per cooldown - calls already in flight will be throttled too)"""
+        now = time.monotonic()
+        if now - self._last_decrease < self.decrease_cooldown:
+            return
+
+        self._last_decrease = now
+        self.limit = max(float(self.min_limit), self.limit / 2)
+        logger.warning(f"Rate limited - concurrency reduced to {int(self.limit)}")
@@ -0,0 +1,135 @@
+"""
+Classification Cache - Persistent LLM classification cache (SQLite)
+"""
+from typing import Any, Dict, Iterable, Optional
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+
+def _normalize(text: Optional[str]) -> str:
+    """Lowercase and collapse whitespace so trivially different queries share entries"""
+    return " ".join((text or "").lower().split())
+
+
+class ClassificationCache:
+    """TTL + size-bounded LRU cache of per-article classifications
+
+    get_many/put_many block on SQLite; call them from a worker thread
+    (asyncio.to_thread). A lock keeps concurrent calls from interleaving.
+    """
+
+    def __init__(self, path: str = "data/classification_cache.db",
+                 ttl_seconds: float = 7 * 24 * 3600, max_entries: int = 50000):
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._lock = threading.Lock()
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS classifications (
+                key TEXT PRIMARY KEY,
+                value TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                last_access REAL NOT NULL
+            )"""
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_classifications_last_access ON classifications (last_access)"
+        )
+        self._conn.commit()
+
+    @staticmethod
+    def make_key(article: Dict[str, Any], query: str, extra_topics: Optional[str],
+                 model: str, prompt_version: str) -> Optional[str]:
+        """Content-addressed key; None if the article cannot be identified"""
+        article_ref = article.get("article_id") or article.get("link")
+        if not article_ref:
+            return None
+
+        raw = "\x1f".join([
+            str(article_ref), _normalize(query), _normalize(extra_topics), model, prompt_version
+        ])
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def get_many(self, keys: Iterable[str]) -> Dict[str, Dict[str, Any]]:
+        """Return cached classifications for the given keys (expired entries are skipped)"""
+        keys = list(dict.fromkeys(keys))
+        if not keys:
+            return {}
+
+        now = time.time()
+        found: Dict[str, Dict[str, Any]] = {}
+
+        try:
+            with self._lock:
+                # Stay under SQLite's bound-parameter limit
+                for i in range(0, len(keys), 500):
+                    batch = keys[i:i + 500]
+                    placeholders = ",".join("?" * len(batch))
+                    rows = self._conn.execute(
+                        f"SELECT key, value FROM classifications "
+                        f"WHERE key IN ({placeholders}) AND created_at > ?",
+                        (*batch, now - self.ttl_seconds)
+                    ).fetchall()
+                    for key, value in rows:
+                        found[key] = json.loads(value)
+
+                if found:
+                    self._conn.executemany(
+                        "UPDATE classifications SET last_access = ? WHERE key = ?",
+                        [(now, key) for key in found]
+                    )
+                    self._conn.commit()
+        except Exception as e:
+            logger.error(f"Classification cache read error: {str(e)}")
+            return {}
+
+        return found
+
+    def put_many(self, items: Dict[str, Dict[str, Any]]):
+        """Store classifications and evict least recently used entries over the limit"""
+        if not items:
+            return
+
+        now = time.time()
+        try:
+            with self._lock:
+                self._conn.executemany(
+                    "INSERT OR REPLACE INTO classifications (key, value, created_at, last_access) "
+                    "VALUES (?, ?, ?, ?)",
+                    [(key, json.dumps(value, ensure_ascii=False), now, now) for key, value in items.items()]
+                )
+                self._evict(now)
+                self._conn.commit()
+        except Exception as e:
+            logger.error(f"Classification cache write error: {str(e)}")
+
+    def close(self):
+        """Close the database connection"""
+        with self._lock:
+            self._conn.close()
+
+    def _evict(self, now: float):
+        """Drop expired entries, then the least recently used ones above max_entries"""
+        self._conn.execute(
+            "DELETE FROM classifications WHERE created_at <= ?", (now - self.ttl_seconds,)
+        )
+
+        count = self._conn.execute("SELECT COUNT(*) FROM classifications").fetchone()[0]
+        overflow = count - self.max_entries
+        if overflow > 0:
+            self._conn.execute(
+                "DELETE FROM classifications WHERE key IN ("
+                "SELECT key FROM classifications ORDER BY last_access LIMIT ?)",
+                (overflow,)
+            )
+            logger.info(f"Evicted {overflow} cached classifications")
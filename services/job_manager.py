@@ -1,29 +1,56 @@
 """
 Job Manager - Manage background jobs
 """
-from typing import Dict, Optional, List, Any
+from typing import Dict, Iterable, Iterator, Optional, List, Any, Tuple
 from datetime import datetime
+import asyncio
+import hashlib
 import json
 import os
+import io
 import csv
-import pandas as pd
 from models import SearchRequest, JobStatus
+from services.job_store import JobStore, FileJobStore
+from services import serialization
 import logging
 
 logger = logging.getLogger(__name__)
 
+EXPORT_COLUMNS = [
+    "Relevance", "Article ID", "Title", "Description",
+    "Link", "Keywords", "Category", "Reasoning"
+]
+
+STREAM_EXPORT_FORMATS = {"json", "csv", "ndjson"}
+
+RELEVANCE_ORDER = {"Very Relevant": 0, "Relevant": 1, "Not Relevant": 2}
+
+# sort parameter -> (key function, reverse)
+RESULT_SORTS = {
+    "relevance": (lambda a: RELEVANCE_ORDER.get(a.get("relevance", ""), 3), False),
+    "-relevance": (lambda a: RELEVANCE_ORDER.get(a.get("relevance", ""), 3), True),
+    "title": (lambda a: (a.get("title") or "").lower(), False),
+    "-title": (lambda a: (a.get("title") or "").lower(), True),
+}
+
 class JobManager:
     """Manage job state and storage"""
     
-    def __init__(self, max_jobs: int = 100):
-        self.jobs: Dict[str, JobStatus] = {}
-        self.max_jobs = max_jobs
+    def __init__(self, max_jobs: int = 100, store: Optional[JobStore] = None):
+        # Running jobs live in memory; finished jobs are handed to the store
+        self.active_jobs: Dict[str, JobStatus] = {}
+        self.store = store or FileJobStore(max_jobs=max_jobs)
+        # Jobs the store evicts still need their exports and watchers cleaned up
+        self.store.on_evict = self._forget_job
+        self._subscribers: Dict[str, List[asyncio.Queue]] = {}
+        # Request fingerprint -> job_id for jobs that are still running
+        self._inflight: Dict[str, str] = {}
+        self._fingerprints: Dict[str, str] = {}
+        # (job_id, format) -> results version the export file was rendered from
+        self._export_versions: Dict[Tuple[str, str], str] = {}
         
         os.makedirs("data", exist_ok=True)
         os.makedirs("results", exist_ok=True)
-        
-        # Load existing results from disk
-        self._load_existing_results()
     
     def create_job(self, job_id: str, request: SearchRequest) -> JobStatus:
         """Create new job"""
@@ -41,16 +68,57 @@ class JobManager:
             results=None
         )
         
-        self.jobs[job_id] = job
+        self.active_jobs[job_id] = job
         
-        if len(self.jobs) > self.max_jobs:
-            self._cleanup_old_jobs()
+        fingerprint = self.request_fingerprint(request)
+        self._inflight[fingerprint] = job_id
+        self._fingerprints[job_id] = fingerprint
         
         return job
     
-    def get_job(self, job_id: str) -> Optional[JobStatus]:
+    def get_job(self, job_id: str, include_results: bool = True) -> Optional[JobStatus]:
         """Get job by ID"""
-        return self.jobs.get(job_id)
+        job = self.active_jobs.get(job_id)
+        if job:
+            return job
+        return self.store.get(job_id, include_results=include_results)
+    
+    @staticmethod
+    def request_fingerprint(request: SearchRequest) -> str:
+        """Fingerprint of everything that affects a search's results
+        
+        API keys are included (hashed) so only the same credentials can join a
+        running job - it is billed to, and may fail with, those keys.
+        """
+        parts = {
+            "news_api_key": hashlib.sha256(request.news_api_key.encode("utf-8")).hexdigest(),
+            "openai_api_key": hashlib.sha256(request.openai_api_key.encode("utf-8")).hexdigest(),
+            "query": " ".join(request.query.lower().split()),
+            "languages": sorted(request.languages),
+            "categories": sorted(request.categories),
+            "extra_topics": " ".join((request.extra_topics or "").lower().split()),
+            "model": request.model,
+            "api_base_url": request.api_base_url,
+            "is_azure": bool(request.is_azure),
+            "api_version": request.api_version,
+            "size": request.size,
+            "max_pages": request.max_pages
+        }
+        raw = json.dumps(parts, sort_keys=True)
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+    
+    def find_inflight_job(self, request: SearchRequest) -> Optional[str]:
+        """Return the ID of a running job for an identical request, if any"""
+        job_id = self._inflight.get(self.request_fingerprint(request))
+        if job_id and job_id in self.active_jobs:
+            return job_id
+        return None
+    
+    def _release_fingerprint(self, job_id: str):
+        """Stop routing identical requests to this job"""
+        fingerprint = self._fingerprints.pop(job_id, None)
+        if fingerprint and self._inflight.get(fingerprint) == job_id:
+            del self._inflight[fingerprint]
     
     def update_job(
         self,
@@ -62,7 +130,7 @@ class JobManager:
         results: Optional[List[Dict[str, Any]]] = None
     ) -> Optional[JobStatus]:
         """Update job"""
-        job = self.jobs.get(job_id)
+        job = self.active_jobs.get(job_id)
         if not job:
             return None
         
@@ -79,27 +147,71 @@ class JobManager:
         
         job.updated_at = datetime.now()
         
-        if status == "completed" and results:
-            self._save_results(job_id, results, job.query)
+        if status in ("completed", "failed"):
+            # Finished - hand over to the persistent store
+            self._release_fingerprint(job_id)
+            del self.active_jobs[job_id]
+            self.store.save(job)
+        
+        if self._subscribers.get(job_id):
+            self.publish(job_id, "status", job.model_dump(mode="json", exclude={"results"}))
         
         return job
     
+    def subscribe(self, job_id: str, max_queued: int = 100) -> asyncio.Queue:
+        """Register a watcher queue for job events"""
+        queue: asyncio.Queue = asyncio.Queue(maxsize=max_queued)
+        self._subscribers.setdefault(job_id, []).append(queue)
+        return queue
+    
+    def unsubscribe(self, job_id: str, queue: asyncio.Queue):
+        """Remove a watcher queue"""
+        queues = self._subscribers.get(job_id, [])
+        if queue in queues:
+            queues.remove(queue)
+        if not queues:
+            self._subscribers.pop(job_id, None)
+    
+    def publish(self, job_id: str, event: str, data: Dict[str, Any]):
+        """Push an event to all watchers of a job"""
+        for queue in self._subscribers.get(job_id, []):
+            if queue.full():
+                # Slow watcher - drop its oldest event rather than block the job
+                try:
+                    queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    pass
+            queue.put_nowait((event, data))
+    
     def delete_job(self, job_id: str) -> bool:
         """Delete job"""
-        if job_id in self.jobs:
-            del self.jobs[job_id]
-            
-            for ext in ['json', 'csv', 'xlsx']:
-                file_path = f"results/{job_id}.{ext}"
-                if os.path.exists(file_path):
-                    os.remove(file_path)
-            
+        was_active = self.active_jobs.pop(job_id, None) is not None
+        was_stored = self.store.delete(job_id)
+        
+        if was_active or was_stored:
+            self._forget_job(job_id)
             return True
         return False
     
+    def _forget_job(self, job_id: str):
+        """Drop everything the manager keeps for a deleted or evicted job"""
+        self._release_fingerprint(job_id)
+        self.publish(job_id, "deleted", {"job_id": job_id})
+        self._export_versions = {
+            key: version for key, version in self._export_versions.items() if key[0] != job_id
+        }
+        
+        # Result files belong to the store; only the export artifact is ours
+        xlsx_path = self._export_path(job_id, "xlsx")
+        try:
+            if os.path.exists(xlsx_path):
+                os.remove(xlsx_path)
+        except Exception as e:
+            logger.error(f"Error removing {xlsx_path}: {str(e)}")
+    
     def list_jobs(self, limit: int = 50) -> List[Dict[str, Any]]:
         """List jobs"""
-        jobs_list = list(self.jobs.values())
+        jobs_list = list(self.active_jobs.values()) + self.store.list_jobs(limit=limit)
         jobs_list.sort(key=lambda x: x.updated_at, reverse=True)
         
         return [
@@ -115,149 +227,181 @@ class JobManager:
             for job in jobs_list[:limit]
         ]
     
-    def _save_results(self, job_id: str, results: List[Dict[str, Any]], query: str):
-        """Save results to JSON"""
-        try:
-            file_path = f"results/{job_id}.json"
-            
-            data = {
-                "job_id": job_id,
-                "query": query,
-                "timestamp": datetime.now().isoformat(),
-                "total_articles": len(results),
-                "articles": results
-            }
-            
-            with open(file_path, 'w', encoding='utf-8') as f:
-                json.dump(data, f, indent=2, ensure_ascii=False)
-            
-            logger.info(f"Saved results: {file_path}")
-            
-        except Exception as e:
-            logger.error(f"Error saving results: {str(e)}")
+    def iter_results(
+        self,
+        job_id: str,
+        relevance: Optional[List[str]] = None,
+        category: Optional[str] = None,
+        keyword: Optional[str] = None,
+        sort: str = "relevance"
+    ) -> Iterator[Dict[str, Any]]:
+        """Iterate a job's results with optional filtering and sorting"""
+        if sort not in RESULT_SORTS:
+            raise ValueError(f"Unsupported sort: {sort}")
+        
+        job = self.active_jobs.get(job_id)
+        if job:
+            articles = (
+                a for a in (job.results or [])
+                if not relevance or a.get("relevance") in relevance
+            )
+        else:
+            articles = self.store.iter_results(job_id, relevance=relevance)
+        
+        if category:
+            category = category.lower()
+            articles = (a for a in articles if category in self._as_list(a.get("category")))
+        
+        if keyword:
+            keyword = keyword.lower()
+            articles = (a for a in articles if keyword in self._searchable_text(a))
+        
+        # Results are stored in relevance order; other orders need the full list
+        if sort != "relevance":
+            key, reverse = RESULT_SORTS[sort]
+            articles = iter(sorted(articles, key=key, reverse=reverse))
+        
+        return articles
+    
+    @staticmethod
+    def _as_list(value: Any) -> List[str]:
+        """Lowercased list from a list or comma-separated string"""
+        if isinstance(value, list):
+            return [str(v).lower() for v in value]
+        if value:
+            return [v.strip().lower() for v in str(value).split(",")]
+        return []
+    
+    @staticmethod
+    def _searchable_text(article: Dict[str, Any]) -> str:
+        """Text that keyword filters match against"""
+        keywords = article.get("keywords")
+        keywords = " ".join(keywords) if isinstance(keywords, list) else str(keywords or "")
+        return " ".join([
+            article.get("title") or "",
+            article.get("description") or "",
+            article.get("reasoning") or "",
+            keywords
+        ]).lower()
     
-    def export_results(self, job_id: str, format: str = "json") -> str:
-        """Export results in different formats"""
-        job = self.jobs.get(job_id)
-        if not job or not job.results:
+    def close(self):
+        """Close the job store"""
+        self.store.close()
+    
+    def iter_export(self, job_id: str, format: str = "json", batch_size: int = 100) -> Iterator[str]:
+        """Stream results as json, csv or ndjson without writing a file"""
+        job = self.get_job(job_id, include_results=False)
+        if not job:
             raise Exception("Job not found or no results")
         
-        if format == "json":
-            return f"results/{job_id}.json"
-        elif format == "csv":
-            csv_path = f"results/{job_id}.csv"
-            self._export_to_csv(job.results, csv_path)
-            return csv_path
-        elif format == "xlsx":
-            xlsx_path = f"results/{job_id}.xlsx"
-            self._export_to_xlsx(job.results, xlsx_path)
-            return xlsx_path
-        else:
+        if format not in STREAM_EXPORT_FORMATS:
             raise Exception(f"Unsupported format: {format}")
+        
+        articles = self.iter_results(job_id)
+        
+        if format == "csv":
+            return self._iter_csv(articles, batch_size)
+        if format == "ndjson":
+            return (serialization.dumps(article) + "\n" for article in articles)
+        return self._iter_json(job, articles)
     
-    def _export_to_csv(self, results: List[Dict[str, Any]], file_path: str):
-        """Export to CSV"""
-        try:
-            with open(file_path, 'w', encoding='utf-8', newline='') as f:
-                writer = csv.writer(f)
-                writer.writerow([
-                    "Relevance", "Article ID", "Title", "Description",
-                    "Link", "Keywords", "Category", "Reasoning"
-                ])
-                
-                for article in results:
-                    keywords = ", ".join(article.get("keywords", [])) if isinstance(article.get("keywords"), list) else article.get("keywords", "")
-                    category = ", ".join(article.get("category", [])) if isinstance(article.get("category"), list) else article.get("category", "")
-                    
-                    writer.writerow([
-                        article.get("relevance", ""),
-                        article.get("article_id", ""),
-                        article.get("title", ""),
-                        article.get("description", ""),
-                        article.get("link", ""),
-                        keywords,
-                        category,
-                        article.get("reasoning", "")
-                    ])
-            
-            logger.info(f"Exported to CSV: {file_path}")
-        except Exception as e:
-            logger.error(f"CSV export error: {str(e)}")
-            raise
+    @staticmethod
+    def results_version(job: JobStatus) -> str:
+        """Identifier that changes whenever a job's results change"""
+        raw = f"{job.job_id}:{job.updated_at.isoformat()}:{job.total_articles}"
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()[:16]
+    
+    def export_results(self, job_id: str, format: str = "xlsx") -> str:
+        """Export results to a file (for formats that cannot be streamed)"""
+        job = self.get_job(job_id, include_results=False)
+        if not job:
+            raise Exception("Job not found or no results")
+        
+        if format != "xlsx":
+            raise Exception(f"Unsupported format: {format}")
+        
+        xlsx_path = self._export_path(job_id, format)
+        version = self.results_version(job)
+        
+        # Reuse the artifact if it was rendered from the same results version
+        if self._export_versions.get((job_id, format)) == version and os.path.exists(xlsx_path):
+            logger.info(f"Serving cached export: {xlsx_path}")
+            return xlsx_path
+        
+        if not job.total_articles:
+            raise Exception("Job not found or no results")
+        
+        self._export_to_xlsx(self.iter_results(job_id), xlsx_path)
+        self._export_versions[(job_id, format)] = version
+        return xlsx_path
+    
+    @staticmethod
+    def _export_path(job_id: str, format: str) -> str:
+        """Where file exports (xlsx) are rendered"""
+        return f"results/{job_id}.{format}"
+    
+    def _iter_json(self, job: JobStatus, articles: Iterator[Dict[str, Any]]) -> Iterator[str]:
+        """Stream the saved-results JSON layout one article at a time"""
+        header = serialization.dumps({
+            "job_id": job.job_id,
+            "query": job.query,
+            "timestamp": job.updated_at.isoformat(),
+            "total_articles": job.total_articles
+        })
+        
+        yield header[:-1] + ', "articles": ['
+        for index, article in enumerate(articles):
+            yield ("," if index else "") + "\n" + serialization.dumps(article)
+        yield "\n]}\n"
+    
+    def _iter_csv(self, articles: Iterator[Dict[str, Any]], batch_size: int) -> Iterator[str]:
+        """Stream CSV in batches of rows"""
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(EXPORT_COLUMNS)
+        
+        for index, article in enumerate(articles, 1):
+            writer.writerow(self._export_row(article))
+            if index % batch_size == 0:
+                yield buffer.getvalue()
+                buffer.seek(0)
+                buffer.truncate()
+        
+        yield buffer.getvalue()
     
-    def _export_to_xlsx(self, results: List[Dict[str, Any]], file_path: str):
-        """Export to Excel"""
+    @staticmethod
+    def _export_row(article: Dict[str, Any]) -> List[str]:
+        """Flatten an article into EXPORT_COLUMNS order"""
+        keywords = ", ".join(article.get("keywords", [])) if isinstance(article.get("keywords"), list) else article.get("keywords", "")
+        category = ", ".join(article.get("category", [])) if isinstance(article.get("category"), list) else article.get("category", "")
+        
+        return [
+            article.get("relevance", ""),
+            article.get("article_id", ""),
+            article.get("title", ""),
+            article.get("description", ""),
+            article.get("link", ""),
+            keywords,
+            category,
+            article.get("reasoning", "")
+        ]
+    
+    def _export_to_xlsx(self, articles: Iterable[Dict[str, Any]], file_path: str):
+        """Export to Excel (openpyxl write-only mode, rows streamed straight to disk)"""
+        # Deferred so openpyxl is only imported when an Excel export is requested
+        from openpyxl import Workbook
+        
         try:
-            data = []
-            for article in results:
-                keywords = ", ".join(article.get("keywords", [])) if isinstance(article.get("keywords"), list) else article.get("keywords", "")
-                category = ", ".join(article.get("category", [])) if isinstance(article.get("category"), list) else article.get("category", "")
-                
-                data.append({
-                    "Relevance": article.get("relevance", ""),
-                    "Article ID": article.get("article_id", ""),
-                    "Title": article.get("title", ""),
-                    "Description": article.get("description", ""),
-                    "Link": article.get("link", ""),
-                    "Keywords": keywords,
-                    "Category": category,
-                    "Reasoning": article.get("reasoning", "")
-                })
+            workbook = Workbook(write_only=True)
+            sheet = workbook.create_sheet("Sheet1")
+            sheet.append(EXPORT_COLUMNS)
             
-            df = pd.DataFrame(data)
-            df.to_excel(file_path, index=False, engine='openpyxl')
+            for article in articles:
+                sheet.append(self._export_row(article))
+            
+            workbook.save(file_path)
             
             logger.info(f"Exported to Excel: {file_path}")
         except Exception as e:
             logger.error(f"Excel export error: {str(e)}")
             raise
-    
-    def _cleanup_old_jobs(self):
-        """Remove oldest jobs"""
-        if len(self.jobs) <= self.max_jobs:
-            return
-        
-        sorted_jobs = sorted(self.jobs.items(), key=lambda x: x[1].created_at)
-        jobs_to_remove = len(self.jobs) - self.max_jobs
-        
-        for i in range(jobs_to_remove):
-            job_id = sorted_jobs[i][0]
-            self.delete_job(job_id)
-            logger.info(f"Cleaned up job: {job_id}")    
-    def _load_existing_results(self):
-        """Load existing result files from disk on startup"""
-        try:
-            for filename in os.listdir("results"):
-                if filename.endswith(".json"):
-                    job_id = filename.replace(".json", "")
-                    file_path = f"results/{filename}"
-                    
-                    try:
-                        with open(file_path, 'r', encoding='utf-8') as f:
-                            data = json.load(f)
-                        
-                        # Get file modification time
-                        file_stat = os.stat(file_path)
-                        modified_time = datetime.fromtimestamp(file_stat.st_mtime)
-                        
-                        # Create job status from saved data
-                        job = JobStatus(
-                            job_id=job_id,
-                            status="completed",
-                            progress=100,
-                            created_at=modified_time,
-                            updated_at=modified_time,
-                            query=data.get("query", "Unknown"),
-                            total_articles=data.get("total_articles", len(data.get("articles", []))),
-                            error=None,
-                            results=data.get("articles", [])
-                        )
-                        
-                        self.jobs[job_id] = job
-                        
-                    except Exception as e:
-                        logger.error(f"Error loading result file {filename}: {str(e)}")
-                        
-            logger.info(f"Loaded {len(self.jobs)} existing results from disk")
-        except Exception as e:
-            logger.error(f"Error loading existing results: {str(e)}")
\ No newline at end of file
@@ -0,0 +1,647 @@
+"""
+Job Store - Pluggable persistence for finished jobs
+"""
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Iterator, Optional, List, Any
+from datetime import datetime
+import gzip
+import os
+import sqlite3
+from models import JobStatus
+from services import serialization
+import logging
+
+logger = logging.getLogger(__name__)
+
+# results_format -> file extension
+RESULT_EXTENSIONS = {
+    "json": ".json",
+    "ndjson.gz": ".ndjson.gz"
+}
+
+
+class JobStore(ABC):
+    """Persistence backend for finished (completed/failed) jobs"""
+
+    # Called with the job_id of every job the store drops on its own (e.g. a size cap)
+    on_evict: Optional[Callable[[str], None]] = None
+
+    @abstractmethod
+    def get(self, job_id: str, include_results: bool = True) -> Optional[JobStatus]:
+        """Get job (results are only loaded if include_results)"""
+
+    @abstractmethod
+    def save(self, job: JobStatus):
+        """Insert or replace a job and its results"""
+
+    @abstractmethod
+    def delete(self, job_id: str) -> bool:
+        """Delete a job; returns False if it did not exist"""
+
+    @abstractmethod
+    def list_jobs(self, limit: int = 50) -> List[JobStatus]:
+        """Most recently updated jobs, without results"""
+
+    def iter_results(self, job_id: str, relevance: Optional[List[str]] = None) -> Iterator[Dict[str, Any]]:
+        """Iterate a job's articles in stored order, optionally filtered by relevance"""
+        job = self.get(job_id)
+        for article in (job.results or []) if job else []:
+            if not relevance or article.get("relevance") in relevance:
+                yield article
+
+    def close(self):
+        """Release resources"""
+
+
+class FileJobStore(JobStore):
+    """Jobs persisted as results/{job_id}.json (or .ndjson.gz)
+
+    Only a compact manifest (one line per job) is read at startup; article
+    bodies are loaded on first access and kept in a small LRU cache.
+    Writes run on a single background thread (in submission order) so the
+    event loop never blocks on serialization or disk I/O.
+    """
+
+    MANIFEST_FILENAME = "manifest.jsonl"
+
+    def __init__(self, results_dir: str = "results", max_jobs: int = 100, body_cache_size: int = 20,
+                 compact_json: bool = False, results_format: str = "json"):
+        if results_format not in RESULT_EXTENSIONS:
+            raise ValueError(f"Unsupported results format: {results_format}")
+
+        self.results_dir = results_dir
+        self.results_format = results_format
+        self.max_jobs = max_jobs
+        self.body_cache_size = body_cache_size
+        self.compact_json = compact_json
+        # Job summaries (results=None); bodies live in _bodies or on disk
+        self.jobs: Dict[str, JobStatus] = {}
+        self._bodies: "OrderedDict[str, List[Dict[str, Any]]]" = OrderedDict()
+        # Bodies queued for writing, served from memory until the file exists
+        self._pending: Dict[str, List[Dict[str, Any]]] = {}
+        self._writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="results-writer")
+
+        os.makedirs(results_dir, exist_ok=True)
+
+        # Load existing results from disk
+        self._load_existing_results()
+
+    def get(self, job_id: str, include_results: bool = True) -> Optional[JobStatus]:
+        job = self.jobs.get(job_id)
+        if not job or not include_results or job.status != "completed":
+            return job
+
+        results = self._load_body(job_id)
+        if results is None:
+            return job
+        return job.model_copy(update={"results": results})
+
+    def save(self, job: JobStatus):
+        self.jobs[job.job_id] = job.model_copy(update={"results": None})
+
+        if job.status == "completed" and job.results:
+            self._cache_body(job.job_id, job.results)
+            self._pending[job.job_id] = job.results
+            self._writer.submit(self._save_results, job.job_id, job.results, job.query)
+            self._submit_manifest()
+
+        if len(self.jobs) > self.max_jobs:
+            self._cleanup_old_jobs()
+
+    def delete(self, job_id: str) -> bool:
+        if job_id not in self.jobs:
+            return False
+
+        job = self.jobs.pop(job_id)
+        self._bodies.pop(job_id, None)
+        self._pending.pop(job_id, None)
+
+        # Queued behind any pending write of the same file
+        for extension in RESULT_EXTENSIONS.values():
+            self._writer.submit(self._remove_file, os.path.join(self.results_dir, f"{job_id}{extension}"))
+
+        if job.status == "completed":
+            self._submit_manifest()
+        return True
+
+    def close(self):
+        """Flush pending writes"""
+        self._writer.shutdown(wait=True)
+
+    def list_jobs(self, limit: int = 50) -> List[JobStatus]:
+        jobs_list = list(self.jobs.values())
+        jobs_list.sort(key=lambda x: x.updated_at, reverse=True)
+        return jobs_list[:limit]
+
+    def _load_body(self, job_id: str) -> Optional[List[Dict[str, Any]]]:
+        """Return a job's articles, reading the results file on a cache miss"""
+        if job_id in self._bodies:
+            self._bodies.move_to_end(job_id)
+            return self._bodies[job_id]
+
+        if job_id in self._pending:
+            return self._pending[job_id]
+
+        file_path = find_result_file(self.results_dir, job_id, prefer=self.results_format)
+        try:
+            results = read_result_data(file_path).get("articles", [])
+        except Exception as e:
+            logger.error(f"Error loading result file {file_path}: {str(e)}")
+            return None
+
+        self._cache_body(job_id, results)
+        return results
+
+    def _cache_body(self, job_id: str, results: List[Dict[str, Any]]):
+        """Insert into the LRU body cache"""
+        self._bodies[job_id] = results
+        self._bodies.move_to_end(job_id)
+        while len(self._bodies) > self.body_cache_size:
+            self._bodies.popitem(last=False)
+
+    def _save_results(self, job_id: str, results: List[Dict[str, Any]], query: str):
+        """Save results in the configured format (runs on the writer thread)"""
+        try:
+            file_path = os.path.join(self.results_dir, f"{job_id}{RESULT_EXTENSIONS[self.results_format]}")
+
+            data = {
+                "job_id": job_id,
+                "query": query,
+                "timestamp": datetime.now().isoformat(),
+                "total_articles": len(results),
+                "articles": results
+            }
+
+            write_result_data(file_path, data, self.results_format, self.compact_json)
+
+            logger.info(f"Saved results: {file_path}")
+
+        except Exception as e:
+            logger.error(f"Error saving results: {str(e)}")
+        finally:
+            if self._pending.get(job_id) is results:
+                self._pending.pop(job_id, None)
+
+    def _remove_file(self, file_path: str):
+        """Delete a results file (runs on the writer thread)"""
+        try:
+            if os.path.exists(file_path):
+                os.remove(file_path)
+        except Exception as e:
+            logger.error(f"Error removing {file_path}: {str(e)}")
+
+    def _submit_manifest(self):
+        """Snapshot completed jobs and queue a manifest rewrite"""
+        entries = [manifest_entry(job) for job in self.jobs.values() if job.status == "completed"]
+        self._writer.submit(self._write_manifest, entries)
+
+    def _write_manifest(self, entries: List[Dict[str, Any]]):
+        """Rewrite the manifest of completed jobs (atomic replace)"""
+        manifest_path = os.path.join(self.results_dir, self.MANIFEST_FILENAME)
+
+        try:
+            write_atomic(manifest_path, lambda f: f.writelines(
+                serialization.dumps(entry) + "\n" for entry in entries
+            ))
+        except Exception as e:
+            logger.error(f"Error writing results manifest: {str(e)}")
+
+    def _read_manifest(self) -> Dict[str, JobStatus]:
+        """Read job summaries from the manifest"""
+        manifest_path = os.path.join(self.results_dir, self.MANIFEST_FILENAME)
+        summaries: Dict[str, JobStatus] = {}
+        if not os.path.exists(manifest_path):
+            return summaries
+
+        try:
+            with open(manifest_path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    if line.strip():
+                        job = job_from_manifest_entry(serialization.loads(line))
+                        summaries[job.job_id] = job
+        except Exception as e:
+            logger.error(f"Error reading results manifest: {str(e)}")
+        return summaries
+
+    def _cleanup_old_jobs(self):
+        """Remove oldest jobs"""
+        if len(self.jobs) <= self.max_jobs:
+            return
+
+        sorted_jobs = sorted(self.jobs.items(), key=lambda x: x[1].created_at)
+        jobs_to_remove = len(self.jobs) - self.max_jobs
+
+        for i in range(jobs_to_remove):
+            job_id = sorted_jobs[i][0]
+            self.delete(job_id)
+            logger.info(f"Cleaned up job: {job_id}")
+            if self.on_evict:
+                self.on_evict(job_id)
+
+    def _load_existing_results(self):
+        """Load job summaries on startup (result files are only parsed if missing from the manifest)"""
+        try:
+            manifest = self._read_manifest()
+            missing = 0
+
+            for filename in os.listdir(self.results_dir):
+                job_id = result_job_id(filename)
+                if job_id:
+                    if job_id in manifest:
+                        self.jobs[job_id] = manifest[job_id]
+                        continue
+
+                    # Not indexed yet (older results) - parse once and add to the manifest
+                    file_path = os.path.join(self.results_dir, filename)
+                    try:
+                        job = load_result_file(job_id, file_path)
+                        self.jobs[job_id] = job.model_copy(update={"results": None})
+                        missing += 1
+                    except Exception as e:
+                        logger.error(f"Error loading result file {filename}: {str(e)}")
+
+            if missing or len(manifest) != len(self.jobs):
+                self._submit_manifest()
+
+            logger.info(f"Indexed {len(self.jobs)} existing results from disk ({missing} newly indexed)")
+        except Exception as e:
+            logger.error(f"Error loading existing results: {str(e)}")
+
+
+class SQLiteJobStore(JobStore):
+    """Jobs and articles in indexed SQLite tables (WAL mode)
+
+    Writes run on a background thread with their own connection; jobs are
+    served from memory until their write has committed, and deleted jobs
+    are hidden until their delete has.
+    """
+
+    _JOB_COLUMNS = "job_id, status, progress, created_at, updated_at, query, total_articles, error"
+
+    def __init__(self, path: str = "data/jobs.db"):
+        self.path = path
+
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS jobs (
+                job_id TEXT PRIMARY KEY,
+                status TEXT NOT NULL,
+                progress INTEGER NOT NULL,
+                created_at TEXT NOT NULL,
+                updated_at TEXT NOT NULL,
+                query TEXT NOT NULL,
+                total_articles INTEGER,
+                error TEXT
+            );
+            CREATE INDEX IF NOT EXISTS idx_jobs_updated_at ON jobs (updated_at);
+            CREATE TABLE IF NOT EXISTS articles (
+                job_id TEXT NOT NULL,
+                position INTEGER NOT NULL,
+                relevance TEXT,
+                data TEXT NOT NULL,
+                PRIMARY KEY (job_id, position)
+            ) WITHOUT ROWID;
+            CREATE INDEX IF NOT EXISTS idx_articles_relevance ON articles (job_id, relevance);
+            """
+        )
+        self._conn.commit()
+
+        # WAL lets the writer connection commit while the main one reads
+        self._write_conn = sqlite3.connect(path, check_same_thread=False)
+        self._write_conn.execute("PRAGMA synchronous=NORMAL")
+        self._pending: Dict[str, JobStatus] = {}
+        # job_id -> token of the queued delete (tombstone)
+        self._deleted: Dict[str, object] = {}
+        self._writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="sqlite-writer")
+
+    def get(self, job_id: str, include_results: bool = True) -> Optional[JobStatus]:
+        pending = self._pending.get(job_id)
+        if pending is not None:
+            return pending if include_results else pending.model_copy(update={"results": None})
+        if job_id in self._deleted:
+            return None
+
+        row = self._conn.execute(
+            f"SELECT {self._JOB_COLUMNS} FROM jobs WHERE job_id = ?", (job_id,)
+        ).fetchone()
+        if row is None:
+            return None
+
+        job = self._row_to_job(row)
+        if not include_results:
+            return job
+
+        articles = self._conn.execute(
+            "SELECT data FROM articles WHERE job_id = ? ORDER BY position", (job_id,)
+        ).fetchall()
+        job.results = [serialization.loads(data) for (data,) in articles] if articles else None
+        return job
+
+    def save(self, job: JobStatus):
+        # Serializing and inserting every article would stall the event loop
+        self._pending[job.job_id] = job
+        self._deleted.pop(job.job_id, None)
+        self._writer.submit(self._write_job, job)
+
+    def _write_job(self, job: JobStatus):
+        """Persist a job and its articles (runs on the writer thread)"""
+        try:
+            with self._write_conn:
+                self._write_conn.execute(
+                    "INSERT OR REPLACE INTO jobs "
+                    "(job_id, status, progress, created_at, updated_at, query, total_articles, error) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                    (
+                        job.job_id, job.status, job.progress, job.created_at.isoformat(),
+                        job.updated_at.isoformat(), job.query, job.total_articles, job.error
+                    )
+                )
+
+                if job.results is not None:
+                    self._write_conn.execute("DELETE FROM articles WHERE job_id = ?", (job.job_id,))
+                    self._write_conn.executemany(
+                        "INSERT INTO articles (job_id, position, relevance, data) VALUES (?, ?, ?, ?)",
+                        [
+                            (job.job_id, position, article.get("relevance"), serialization.dumps(article))
+                            for position, article in enumerate(job.results)
+                        ]
+                    )
+        except Exception as e:
+            logger.error(f"Error saving job {job.job_id}: {str(e)}")
+        finally:
+            if self._pending.get(job.job_id) is job:
+                self._pending.pop(job.job_id, None)
+
+    def delete(self, job_id: str) -> bool:
+        was_pending = self._pending.pop(job_id, None) is not None
+        exists = was_pending or (job_id not in self._deleted and self._conn.execute(
+            "SELECT 1 FROM jobs WHERE job_id = ?", (job_id,)
+        ).fetchone() is not None)
+        if not exists:
+            return False
+
+        # Queued behind any pending write of the same job; hidden until it commits
+        token = object()
+        self._deleted[job_id] = token
+        self._writer.submit(self._delete_job, job_id, token)
+        return True
+
+    def _delete_job(self, job_id: str, token: object):
+        """Remove a job and its articles (runs on the writer thread)"""
+        try:
+            with self._write_conn:
+                self._write_conn.execute("DELETE FROM jobs WHERE job_id = ?", (job_id,))
+                self._write_conn.execute("DELETE FROM articles WHERE job_id = ?", (job_id,))
+        except Exception as e:
+            logger.error(f"Error deleting job {job_id}: {str(e)}")
+        finally:
+            if self._deleted.get(job_id) is token:
+                self._deleted.pop(job_id, None)
+
+    def list_jobs(self, limit: int = 50) -> List[JobStatus]:
+        deleted = set(self._deleted)
+        rows = self._conn.execute(
+            f"SELECT {self._JOB_COLUMNS} FROM jobs ORDER BY updated_at DESC LIMIT ?", (limit + len(deleted),)
+        ).fetchall()
+        jobs = {job.job_id: job for job in map(self._row_to_job, rows) if job.job_id not in deleted}
+        for job in list(self._pending.values()):
+            jobs[job.job_id] = job.model_copy(update={"results": None})
+
+        jobs_list = sorted(jobs.values(), key=lambda x: x.updated_at, reverse=True)
+        return jobs_list[:limit]
+
+    def iter_results(self, job_id: str, relevance: Optional[List[str]] = None) -> Iterator[Dict[str, Any]]:
+        pending = self._pending.get(job_id)
+        if pending is not None:
+            yield from super().iter_results(job_id, relevance)
+            return
+        if job_id in self._deleted:
+            return
+
+        # Stream rows from the cursor instead of materializing the whole job
+        sql = "SELECT data FROM articles WHERE job_id = ?"
+        params: List[Any] = [job_id]
+        if relevance:
+            sql += f" AND relevance IN ({','.join('?' * len(relevance))})"
+            params.extend(relevance)
+        sql += " ORDER BY position"
+
+        for (data,) in self._conn.execute(sql, params):
+            yield serialization.loads(data)
+
+    def is_empty(self) -> bool:
+        return self._conn.execute("SELECT 1 FROM jobs LIMIT 1").fetchone() is None
+
+    def import_result_files(self, results_dir: str = "results"):
+        """One-time import of result files written by FileJobStore"""
+        if not os.path.isdir(results_dir):
+            return
+
+        imported = 0
+        for filename in os.listdir(results_dir):
+            job_id = result_job_id(filename)
+            if job_id:
+                try:
+                    # Startup, before any request - write synchronously
+                    self._write_job(load_result_file(job_id, os.path.join(results_dir, filename)))
+                    imported += 1
+                except Exception as e:
+                    logger.error(f"Error importing result file {filename}: {str(e)}")
+
+        if imported:
+            logger.info(f"Imported {imported} result files into {self.path}")
+
+    def close(self):
+        """Flush pending writes"""
+        self._writer.shutdown(wait=True)
+        self._write_conn.close()
+        self._conn.close()
+
+    def _row_to_job(self, row) -> JobStatus:
+        job_id, status, progress, created_at, updated_at, query, total_articles, error = row
+        return JobStatus(
+            job_id=job_id,
+            status=status,
+            progress=progress,
+            created_at=datetime.fromisoformat(created_at),
+            updated_at=datetime.fromisoformat(updated_at),
+            query=query,
+            total_articles=total_articles,
+            error=error,
+            results=None
+        )
+
+
+def result_job_id(filename: str) -> Optional[str]:
+    """Job ID of a results file name, or None if it is not one"""
+    for extension in RESULT_EXTENSIONS.values():
+        if filename.endswith(extension):
+            return filename[:-len(extension)]
+    return None
+
+
+def find_result_file(results_dir: str, job_id: str, prefer: str = "json") -> str:
+    """Path of a job's results file in whichever format exists"""
+    formats = [prefer] + [fmt for fmt in RESULT_EXTENSIONS if fmt != prefer]
+    for fmt in formats:
+        file_path = os.path.join(results_dir, f"{job_id}{RESULT_EXTENSIONS[fmt]}")
+        if os.path.exists(file_path):
+            return file_path
+    return os.path.join(results_dir, f"{job_id}{RESULT_EXTENSIONS[prefer]}")
+
+
+def read_result_data(file_path: str) -> Dict[str, Any]:
+    """Read a results file (header fields plus "articles") in either format"""
+    if file_path.endswith(RESULT_EXTENSIONS["ndjson.gz"]):
+        with gzip.open(file_path, 'rt', encoding='utf-8') as f:
+            data = serialization.loads(f.readline())
+            data["articles"] = [serialization.loads(line) for line in f if line.strip()]
+        return data
+
+    with open(file_path, 'rb') as f:
+        return serialization.loads(f.read())
+
+
+def write_result_data(file_path: str, data: Dict[str, Any], results_format: str = "json",
+                      compact_json: bool = False):
+    """Write a results file atomically in the given format"""
+    if results_format == "ndjson.gz":
+        # First line is the header, then one article per line
+        header = {key: value for key, value in data.items() if key != "articles"}
+
+        def write(f):
+            f.write(serialization.dumps(header) + "\n")
+            for article in data["articles"]:
+                f.write(serialization.dumps(article) + "\n")
+
+        write_atomic(file_path, write, compress=True)
+    elif compact_json:
+        write_atomic(file_path, lambda f: f.write(serialization.dumps(data)))
+    else:
+        write_atomic(file_path, lambda f: f.write(serialization.dumps(data, indent=True)))
+
+
+def migrate_results(results_dir: str = "results", target_format: str = "ndjson.gz",
+                    compact_json: bool = False) -> int:
+    """Rewrite every results file in target_format; returns the number converted"""
+    target_extension = RESULT_EXTENSIONS[target_format]
+    converted = 0
+
+    for filename in os.listdir(results_dir):
+        job_id = result_job_id(filename)
+        if not job_id or filename.endswith(target_extension):
+            continue
+
+        source_path = os.path.join(results_dir, filename)
+        try:
+            data = read_result_data(source_path)
+            stat = os.stat(source_path)
+            target_path = os.path.join(results_dir, f"{job_id}{target_extension}")
+            write_result_data(target_path, data, target_format, compact_json)
+            # Keep the original mtime - it is the job timestamp for unindexed files
+            os.utime(target_path, (stat.st_atime, stat.st_mtime))
+            os.remove(source_path)
+            converted += 1
+        except Exception as e:
+            logger.error(f"Error migrating {filename}: {str(e)}")
+
+    logger.info(f"Migrated {converted} result files to {target_format}")
+    return converted
+
+
+def load_result_file(job_id: str, file_path: str) -> JobStatus:
+    """Build a completed JobStatus from a saved results file"""
+    data = read_result_data(file_path)
+
+    # Get file modification time
+    file_stat = os.stat(file_path)
+    modified_time = datetime.fromtimestamp(file_stat.st_mtime)
+
+    # Create job status from saved data
+    return JobStatus(
+        job_id=job_id,
+        status="completed",
+        progress=100,
+        created_at=modified_time,
+        updated_at=modified_time,
+        query=data.get("query", "Unknown"),
+        total_articles=data.get("total_articles", len(data.get("articles", []))),
+        error=None,
+        results=data.get("articles", [])
+    )
+
+
+def write_atomic(file_path: str, write, compress: bool = False) -> None:
+    """Write via a temp file and rename, so readers never see a partial file"""
+    tmp_path = f"{file_path}.tmp"
+    opener = gzip.open if compress else open
+    with opener(tmp_path, 'wt', encoding='utf-8') as f:
+        write(f)
+    os.replace(tmp_path, file_path)
+
+
+def manifest_entry(job: JobStatus) -> Dict[str, Any]:
+    """Compact per-job header stored in the results manifest"""
+    return {
+        "job_id": job.job_id,
+        "query": job.query,
+        "total_articles": job.total_articles,
+        "created_at": job.created_at.isoformat(),
+        "updated_at": job.updated_at.isoformat()
+    }
+
+
+def job_from_manifest_entry(entry: Dict[str, Any]) -> JobStatus:
+    """Build a completed job summary (without results) from a manifest entry"""
+    return JobStatus(
+        job_id=entry["job_id"],
+        status="completed",
+        progress=100,
+        created_at=datetime.fromisoformat(entry["created_at"]),
+        updated_at=datetime.fromisoformat(entry["updated_at"]),
+        query=entry.get("query", "Unknown"),
+        total_articles=entry.get("total_articles"),
+        error=None,
+        results=None
+    )
+
+
+def create_job_store(backend: str = "file", results_dir: str = "results", max_jobs: int = 100,
+                     sqlite_path: str = "data/jobs.db", body_cache_size: int = 20,
+                     compact_json: bool = False, results_format: str = "json") -> JobStore:
+    """Create the configured job store"""
+    if backend == "file":
+        return FileJobStore(
+            results_dir=results_dir,
+            max_jobs=max_jobs,
+            body_cache_size=body_cache_size,
+            compact_json=compact_json,
+            results_format=results_format
+        )
+
+    if backend == "sqlite":
+        store = SQLiteJobStore(path=sqlite_path)
+        if store.is_empty():
+            store.import_result_files(results_dir)
+        return store
+
+    raise ValueError(f"Unsupported job store backend: {backend}")
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Convert saved results to another on-disk format")
+    parser.add_argument("--results-dir", default="results")
+    parser.add_argument("--to", dest="target_format", choices=sorted(RESULT_EXTENSIONS), default="ndjson.gz")
+    parser.add_argument("--compact", action="store_true", help="Unindented output when converting to json")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    migrate_results(args.results_dir, args.target_format, args.compact)
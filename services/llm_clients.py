@@ -0,0 +1,155 @@
+"""
+LLM Clients - Process-wide pool of OpenAI/Azure OpenAI clients
+"""
+from contextlib import asynccontextmanager
+from typing import Dict, Optional, Tuple
+import asyncio
+import hashlib
+import httpx
+import logging
+import time
+
+from services.backoff import AdaptiveConcurrencyLimiter
+
+logger = logging.getLogger(__name__)
+
+ClientKey = Tuple[str, Optional[str], bool, Optional[str]]
+
+
+class _PooledClient:
+    """A cached client with lease bookkeeping
+
+    The AIMD limiter lives here so every job using the same credentials
+    shares one concurrency limit, matching the provider's per-key rate limit.
+    """
+
+    def __init__(self, client, max_concurrency: int):
+        self.client = client
+        self.limiter = AdaptiveConcurrencyLimiter(max_concurrency)
+        self.leases = 0
+        self.last_used = time.monotonic()
+
+
+class LLMClientRegistry:
+    """Share keep-alive LLM clients across jobs with the same credentials"""
+
+    def __init__(self, idle_timeout: float = 300.0, max_connections: int = 20,
+                 max_keepalive_connections: int = 10, timeout: float = 120.0,
+                 max_concurrency: int = 4):
+        self.idle_timeout = idle_timeout
+        self.max_concurrency = max_concurrency
+        self.max_connections = max_connections
+        self.max_keepalive_connections = max_keepalive_connections
+        self.timeout = timeout
+        self._clients: Dict[ClientKey, _PooledClient] = {}
+        self._lock = asyncio.Lock()
+        self._evict_task: Optional[asyncio.Task] = None
+
+    def start(self):
+        """Close idle clients in the background, even when no new jobs arrive (app startup)"""
+        if self._evict_task is None or self._evict_task.done():
+            self._evict_task = asyncio.create_task(self._evict_periodically())
+
+    @asynccontextmanager
+    async def lease(self, api_key: str, base_url: Optional[str] = None,
+                    is_azure: bool = False, api_version: Optional[str] = None):
+        """Borrow a pooled entry (.client, .limiter); it is never evicted while leased"""
+        key = self._make_key(api_key, base_url, is_azure, api_version)
+
+        async with self._lock:
+            await self._evict_idle()
+            entry = self._clients.get(key)
+            if entry is None:
+                entry = _PooledClient(
+                    self._create_client(api_key, base_url, is_azure, api_version), self.max_concurrency
+                )
+                self._clients[key] = entry
+                logger.info(f"Created pooled LLM client ({len(self._clients)} cached)")
+            entry.leases += 1
+
+        try:
+            yield entry
+        finally:
+            entry.leases -= 1
+            entry.last_used = time.monotonic()
+
+    async def close(self):
+        """Close all pooled clients (app shutdown)"""
+        if self._evict_task is not None:
+            self._evict_task.cancel()
+            await asyncio.gather(self._evict_task, return_exceptions=True)
+            self._evict_task = None
+
+        async with self._lock:
+            for entry in self._clients.values():
+                await self._close_client(entry.client)
+            self._clients.clear()
+
+    def _make_key(self, api_key: str, base_url: Optional[str], is_azure: bool,
+                  api_version: Optional[str]) -> ClientKey:
+        """Build cache key without keeping the raw API key around"""
+        key_hash = hashlib.sha256(api_key.encode("utf-8")).hexdigest()
+        return (key_hash, base_url, bool(is_azure), api_version)
+
+    def _create_client(self, api_key: str, base_url: Optional[str], is_azure: bool,
+                       api_version: Optional[str]):
+        """Create a client backed by a keep-alive connection pool"""
+        # Deferred: the openai SDK dominates cold-start import time
+        import openai
+
+        http_client = httpx.AsyncClient(
+            timeout=self.timeout,
+            limits=httpx.Limits(
+                max_connections=self.max_connections,
+                max_keepalive_connections=self.max_keepalive_connections,
+                keepalive_expiry=self.idle_timeout
+            )
+        )
+
+        # AIAnalyzer retries with rate-limit aware backoff; SDK retries would multiply attempts
+        if is_azure:
+            # Azure OpenAI configuration - using base_url like the original sync version
+            return openai.AsyncAzureOpenAI(
+                api_key=api_key,
+                base_url=base_url or "https://api.openai.com/v1",
+                api_version=api_version or "2024-10-21",
+                http_client=http_client,
+                max_retries=0
+            )
+
+        # Standard OpenAI configuration
+        if base_url:
+            return openai.AsyncOpenAI(api_key=api_key, base_url=base_url, http_client=http_client, max_retries=0)
+        return openai.AsyncOpenAI(api_key=api_key, http_client=http_client, max_retries=0)
+
+    async def _evict_periodically(self):
+        """Run idle eviction every half idle_timeout"""
+        while True:
+            await asyncio.sleep(self.idle_timeout / 2)
+            try:
+                async with self._lock:
+                    await self._evict_idle()
+            except Exception as e:
+                logger.error(f"Error evicting idle LLM clients: {str(e)}")
+
+    async def _evict_idle(self):
+        """Close clients that have been unused for longer than idle_timeout"""
+        now = time.monotonic()
+        expired = [
+            key for key, entry in self._clients.items()
+            if entry.leases == 0 and now - entry.last_used > self.idle_timeout
+        ]
+
+        for key in expired:
+            entry = self._clients.pop(key)
+            await self._close_client(entry.client)
+
+        if expired:
+            logger.info(f"Evicted {len(expired)} idle LLM clients")
+
+    async def _close_client(self, client):
+        """Close a client, ignoring errors during shutdown"""
+        try:
+            await client.close()
+        except Exception as e:
+            logger.error(f"Error closing LLM client: {str(e)}")
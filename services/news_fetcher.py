@@ -2,17 +2,63 @@
 News Fetcher - NewsData.io API integration
 """
 import httpx
-from typing import List, Dict, Any
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Hashable, List, Dict, Any, Optional
+import asyncio
+import importlib.util
 import logging
 
+from services.backoff import RETRYABLE_STATUS_CODES, retry_delay
+from services.rate_limiter import RateLimiterRegistry
+from services.response_cache import ResponseCache
+
 logger = logging.getLogger(__name__)
 
+
+def create_http_client(max_connections: int = 50, max_keepalive_connections: int = 20,
+                       keepalive_expiry: float = 60.0, timeout: float = 30.0,
+                       http2: bool = True) -> httpx.AsyncClient:
+    """Create a long-lived pooled client to share between NewsFetcher instances"""
+    # HTTP/2 needs the optional h2 package
+    use_http2 = http2 and importlib.util.find_spec("h2") is not None
+    
+    return httpx.AsyncClient(
+        timeout=timeout,
+        http2=use_http2,
+        limits=httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive_connections,
+            keepalive_expiry=keepalive_expiry
+        )
+    )
+
+
 class NewsFetcher:
     """Fetch news from NewsData.io"""
     
-    def __init__(self, api_key: str):
+    def __init__(self, api_key: str, client: Optional[httpx.AsyncClient] = None,
+                 cache: Optional[ResponseCache] = None, rate_limiter: Optional[RateLimiterRegistry] = None,
+                 owner: Hashable = None, max_retries: int = 3, retry_base_delay: float = 2.0,
+                 retry_max_delay: float = 120.0):
         self.api_key = api_key
         self.base_url = "https://newsdata.io/api/1/news"
+        self.client = client
+        self.cache = cache
+        # Shared per-key bucket; owner (the job id) is the unit of fair queuing
+        self.bucket = rate_limiter.get(api_key) if rate_limiter else None
+        self.owner = owner
+        self.max_retries = max_retries
+        self.retry_base_delay = retry_base_delay
+        self.retry_max_delay = retry_max_delay
+        
+    @asynccontextmanager
+    async def _get_client(self):
+        """Use the shared client if one was injected, otherwise a short-lived one"""
+        if self.client is not None:
+            yield self.client
+        else:
+            async with httpx.AsyncClient(timeout=30.0) as client:
+                yield client
         
     async def fetch_articles(
         self,
@@ -25,6 +71,32 @@ class NewsFetcher:
     ) -> List[Dict[str, Any]]:
         """Fetch articles with pagination"""
         all_articles = []
+        
+        async for page in self.iter_pages(
+            query=query,
+            languages=languages,
+            categories=categories,
+            size=size,
+            max_pages=max_pages,
+            progress_callback=progress_callback
+        ):
+            all_articles.extend(page)
+        
+        return all_articles
+    
+    async def iter_pages(
+        self,
+        query: str,
+        languages: List[str],
+        categories: List[str],
+        size: int = 10,
+        max_pages: int = 10,
+        progress_callback=None
+    ) -> AsyncIterator[List[Dict[str, Any]]]:
+        """Yield de-duplicated articles page by page as they are fetched"""
+        seen_links = set()
+        fetched_count = 0
+        unique_count = 0
         page_count = 0
         next_page = None
         
@@ -33,66 +105,105 @@ class NewsFetcher:
         
         logger.info(f"Fetching: query='{query}', lang={language_str}, cat={category_str}")
         
-        async with httpx.AsyncClient(timeout=30.0) as client:
+        async with self._get_client() as client:
             while page_count < max_pages:
-                try:
-                    params = {
-                        "apikey": self.api_key,
-                        "q": query,
-                        "language": language_str,
-                        "category": category_str,
-                        "size": size,
-                        "prioritydomain": "top"
-                    }
-                    
-                    if next_page:
-                        params["page"] = next_page
-                    
-                    logger.info(f"Fetching page {page_count + 1}...")
-                    
-                    response = await client.get(self.base_url, params=params)
-                    response.raise_for_status()
-                    
-                    data = response.json()
-                    
-                    if data.get("status") == "error":
-                        error_msg = data.get("results", {}).get("message", "Unknown error")
-                        raise Exception(f"API error: {error_msg}")
-                    
-                    results = data.get("results", [])
-                    if not results:
-                        break
-                    
-                    all_articles.extend(results)
-                    logger.info(f"Fetched {len(results)} articles (total: {len(all_articles)})")
-                    
-                    # Call progress callback if provided
-                    if progress_callback:
-                        logger.info(f"Calling progress callback with {len(all_articles)} articles")
-                        await progress_callback(len(all_articles))
-                    
-                    next_page = data.get("nextPage")
-                    if not next_page:
-                        break
-                    
-                    page_count += 1
-                    
-                except httpx.HTTPStatusError as e:
-                    logger.error(f"HTTP error: {e.response.status_code}")
-                    raise Exception(f"HTTP {e.response.status_code}")
-                except Exception as e:
-                    logger.error(f"Error: {str(e)}")
-                    raise
-        
-        # Remove duplicates
-        unique_articles = self._remove_duplicates(all_articles)
-        logger.info(f"Removed {len(all_articles) - len(unique_articles)} duplicates")
+                params = {
+                    "apikey": self.api_key,
+                    "q": query,
+                    "language": language_str,
+                    "category": category_str,
+                    "size": size,
+                    "prioritydomain": "top"
+                }
+                
+                if next_page:
+                    params["page"] = next_page
+                
+                logger.info(f"Fetching page {page_count + 1}...")
+                
+                if self.cache:
+                    data = await self.cache.get_or_fetch(
+                        self.base_url, params, lambda: self._fetch_page(client, params)
+                    )
+                else:
+                    data = await self._fetch_page(client, params)
+                
+                results = data.get("results", [])
+                if not results:
+                    break
+                
+                # Remove duplicates across all pages seen so far
+                unique = self._remove_duplicates(results, seen_links)
+                fetched_count += len(results)
+                unique_count += len(unique)
+                logger.info(f"Fetched {len(results)} articles (total: {fetched_count}, unique: {unique_count})")
+                
+                # Call progress callback if provided
+                if progress_callback:
+                    logger.info(f"Calling progress callback with {unique_count} articles")
+                    await progress_callback(unique_count)
+                
+                if unique:
+                    yield unique
+                
+                next_page = data.get("nextPage")
+                if not next_page:
+                    break
+                
+                page_count += 1
         
-        return unique_articles
+        logger.info(f"Removed {fetched_count - unique_count} duplicates")
     
-    def _remove_duplicates(self, articles: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    async def _fetch_page(self, client: httpx.AsyncClient, params: Dict[str, Any]) -> Dict[str, Any]:
+        """Fetch a single page from NewsData.io, retrying rate limits and transient errors"""
+        attempt = 0
+        while True:
+            if self.bucket:
+                await self.bucket.acquire(self.owner)
+            
+            try:
+                response = await client.get(self.base_url, params=params)
+                response.raise_for_status()
+                
+                data = response.json()
+                
+                if data.get("status") == "error":
+                    error_msg = data.get("results", {}).get("message", "Unknown error")
+                    raise Exception(f"API error: {error_msg}")
+                
+                return data
+                
+            except (httpx.HTTPStatusError, httpx.TransportError) as e:
+                status = e.response.status_code if isinstance(e, httpx.HTTPStatusError) else None
+                if attempt >= self.max_retries or (status is not None and status not in RETRYABLE_STATUS_CODES):
+                    if status is None:
+                        logger.error(f"Error: {str(e)}")
+                        raise
+                    logger.error(f"HTTP error: {status}")
+                    raise Exception(f"HTTP {status}")
+                
+                headers = e.response.headers if status is not None else None
+                delay = retry_delay(attempt, headers, self.retry_base_delay, self.retry_max_delay)
+            except Exception as e:
+                logger.error(f"Error: {str(e)}")
+                raise
+            
+            attempt += 1
+            logger.warning(
+                f"NewsData.io request failed ({status or 'connection error'}), "
+                f"retry {attempt}/{self.max_retries} in {delay:.1f}s"
+            )
+            
+            if status == 429 and self.bucket:
+                # Pause every job using this key, not just this one
+                self.bucket.penalize(delay)
+            else:
+                await asyncio.sleep(delay)
+    
+    def _remove_duplicates(self, articles: List[Dict[str, Any]], seen_links: Optional[set] = None) -> List[Dict[str, Any]]:
         """Remove duplicate articles by link"""
-        seen_links = set()
+        if seen_links is None:
+            seen_links = set()
         unique = []
         
         for article in articles:
@@ -0,0 +1,129 @@
+"""
+Rate Limiter - Per-API-key token buckets with fair queuing between jobs
+"""
+from collections import OrderedDict, deque
+from typing import Deque, Dict, Hashable, Optional
+import asyncio
+import hashlib
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class FairTokenBucket:
+    """Token bucket whose waiters are served round-robin by owner (e.g. job id)
+
+    A job fetching many pages cannot starve a job that queued later: each
+    owner with waiters gets one token in turn.
+    """
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = max(1.0, capacity)
+        self.tokens = self.capacity
+        self._updated = time.monotonic()
+        self._blocked_until = 0.0
+        self._waiters: "OrderedDict[Hashable, Deque[asyncio.Future]]" = OrderedDict()
+        self._dispatcher: Optional[asyncio.Task] = None
+
+    async def acquire(self, owner: Hashable = None):
+        """Wait for a token"""
+        self._refill()
+        if not self._waiters and self.tokens >= 1 and time.monotonic() >= self._blocked_until:
+            self.tokens -= 1
+            return
+
+        future = asyncio.get_running_loop().create_future()
+        self._waiters.setdefault(owner, deque()).append(future)
+        logger.info(f"Rate limited - queued request ({self.waiting} waiting)")
+
+        if self._dispatcher is None or self._dispatcher.done():
+            self._dispatcher = asyncio.create_task(self._dispatch())
+
+        # A cancelled waiter leaves a done future behind; the dispatcher skips it
+        await future
+
+    def penalize(self, delay: float):
+        """Upstream rejected us (429): pause for delay seconds, then resume at the refill rate
+
+        Banked burst tokens are dropped (the key is evidently busier than we
+        thought) except one, so a single request can probe once the pause ends.
+        """
+        self._refill()
+        self.tokens = min(self.tokens, 1.0)
+        self._blocked_until = max(self._blocked_until, time.monotonic() + delay)
+
+    @property
+    def waiting(self) -> int:
+        return sum(len(queue) for queue in self._waiters.values())
+
+    @property
+    def idle(self) -> bool:
+        """No waiters and a full bucket - safe to discard"""
+        self._refill()
+        return not self._waiters and self.tokens >= self.capacity
+
+    async def _dispatch(self):
+        """Hand out tokens to queued owners in round-robin order"""
+        while self._waiters:
+            self._refill()
+            now = time.monotonic()
+            if now < self._blocked_until:
+                await asyncio.sleep(self._blocked_until - now)
+                continue
+            if self.tokens < 1:
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+                continue
+
+            owner, queue = next(iter(self._waiters.items()))
+            future = queue.popleft()
+            if queue:
+                self._waiters.move_to_end(owner)
+            else:
+                del self._waiters[owner]
+
+            if not future.done():
+                self.tokens -= 1
+                future.set_result(None)
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+
+class RateLimiterRegistry:
+    """One token bucket per API key, shared by every fetcher in the process
+
+    A bucket can spend its full capacity and then everything it refills
+    within one window, so the two are sized to add up to the limit: at most
+    burst requests back-to-back, the rest of the window paced evenly.
+    """
+
+    def __init__(self, requests: int = 30, window_seconds: float = 900.0, burst: int = 10,
+                 max_buckets: int = 1000):
+        if requests < 2:
+            raise ValueError("A NewsData.io rate limit needs at least 2 requests per window")
+
+        self.capacity = max(1, min(burst, requests - 1))
+        self.rate = (requests - self.capacity) / window_seconds
+        self.max_buckets = max_buckets
+        self._buckets: Dict[str, FairTokenBucket] = {}
+
+    def get(self, api_key: str) -> FairTokenBucket:
+        """Bucket for the key (keyed by hash so raw keys are not kept around)"""
+        key = hashlib.sha256(api_key.encode("utf-8")).hexdigest()
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            if len(self._buckets) >= self.max_buckets:
+                self._evict_idle()
+            bucket = FairTokenBucket(self.rate, self.capacity)
+            self._buckets[key] = bucket
+        return bucket
+
+    def _evict_idle(self):
+        """Forget keys that are not currently limited"""
+        idle = [key for key, bucket in self._buckets.items() if bucket.idle]
+        for key in idle:
+            del self._buckets[key]
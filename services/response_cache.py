@@ -0,0 +1,147 @@
+"""
+Response Cache - In-memory + on-disk cache for NewsData.io pages
+"""
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import time
+
+logger = logging.getLogger(__name__)
+
+# Never part of the cache key - identical searches share entries across users
+EXCLUDED_PARAMS = {"apikey"}
+
+
+class ResponseCache:
+    """TTL cache with single-flight coalescing of identical upstream requests"""
+
+    def __init__(self, directory: str = "data/newsdata_cache", ttl_seconds: float = 600.0,
+                 max_memory_entries: int = 256, prune_interval: Optional[float] = None):
+        self.directory = directory
+        self.ttl_seconds = ttl_seconds
+        self.max_memory_entries = max_memory_entries
+        # Files for queries that are never repeated are only removed by prune()
+        self.prune_interval = prune_interval if prune_interval is not None else ttl_seconds
+        self._last_prune = 0.0
+        self._memory: "OrderedDict[str, Tuple[float, Dict[str, Any]]]" = OrderedDict()
+        self._inflight: Dict[Tuple[str, str], asyncio.Future] = {}
+
+        os.makedirs(directory, exist_ok=True)
+        self.prune()
+
+    def make_key(self, url: str, params: Dict[str, Any]) -> str:
+        """Hash the request URL and parameters (page token included, API key excluded)"""
+        cacheable = {k: v for k, v in params.items() if k not in EXCLUDED_PARAMS}
+        raw = json.dumps([url, cacheable], sort_keys=True, default=str)
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def _credential(self, params: Dict[str, Any]) -> str:
+        """Hash of the excluded (credential) parameters"""
+        secret = json.dumps([params.get(k) for k in sorted(EXCLUDED_PARAMS)], default=str)
+        return hashlib.sha256(secret.encode("utf-8")).hexdigest()
+
+    async def get_or_fetch(self, url: str, params: Dict[str, Any],
+                           fetch: Callable[[], Awaitable[Dict[str, Any]]]) -> Dict[str, Any]:
+        """Return a cached response, or fetch it once for concurrent callers sharing an API key"""
+        key = self.make_key(url, params)
+
+        data = self._get(key)
+        if data is not None:
+            logger.info("NewsData.io cache hit")
+            return data
+
+        # Only coalesce callers with the same API key, so a bad key's error
+        # never fails another user's request; the cached response is shared
+        flight = (key, self._credential(params))
+        task = self._inflight.get(flight)
+        if task is None:
+            task = asyncio.ensure_future(self._fetch_and_store(key, fetch))
+            self._inflight[flight] = task
+            task.add_done_callback(lambda _: self._inflight.pop(flight, None))
+        else:
+            logger.info("Joining in-flight NewsData.io request")
+
+        # Shield so one cancelled caller does not cancel the shared fetch
+        return await asyncio.shield(task)
+
+    def prune(self):
+        """Delete expired cache files"""
+        now = time.time()
+        self._last_prune = now
+        removed = 0
+        try:
+            for filename in os.listdir(self.directory):
+                file_path = os.path.join(self.directory, filename)
+                if filename.endswith(".json") and now - os.path.getmtime(file_path) > self.ttl_seconds:
+                    os.remove(file_path)
+                    removed += 1
+        except Exception as e:
+            logger.error(f"Error pruning response cache: {str(e)}")
+
+        if removed:
+            logger.info(f"Pruned {removed} expired NewsData.io responses")
+
+    async def _fetch_and_store(self, key: str, fetch: Callable[[], Awaitable[Dict[str, Any]]]) -> Dict[str, Any]:
+        """Fetch upstream and cache the response (errors are not cached)"""
+        data = await fetch()
+        self._set(key, data)
+        return data
+
+    def _get(self, key: str) -> Optional[Dict[str, Any]]:
+        """Look up memory first, then disk"""
+        now = time.time()
+
+        entry = self._memory.get(key)
+        if entry is not None:
+            expires_at, data = entry
+            if expires_at > now:
+                self._memory.move_to_end(key)
+                return data
+            del self._memory[key]
+
+        file_path = self._file_path(key)
+        if not os.path.exists(file_path):
+            return None
+
+        try:
+            with open(file_path, 'r', encoding='utf-8') as f:
+                stored = json.load(f)
+
+            if stored.get("expires_at", 0) <= now:
+                os.remove(file_path)
+                return None
+
+            self._remember(key, stored["expires_at"], stored["data"])
+            return stored["data"]
+        except Exception as e:
+            logger.error(f"Error reading cached response: {str(e)}")
+            return None
+
+    def _set(self, key: str, data: Dict[str, Any]):
+        """Store in memory and on disk"""
+        now = time.time()
+        if now - self._last_prune >= self.prune_interval:
+            self.prune()
+
+        expires_at = now + self.ttl_seconds
+        self._remember(key, expires_at, data)
+
+        try:
+            with open(self._file_path(key), 'w', encoding='utf-8') as f:
+                json.dump({"expires_at": expires_at, "data": data}, f, ensure_ascii=False)
+        except Exception as e:
+            logger.error(f"Error writing cached response: {str(e)}")
+
+    def _remember(self, key: str, expires_at: float, data: Dict[str, Any]):
+        """Insert into the in-memory LRU"""
+        self._memory[key] = (expires_at, data)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_memory_entries:
+            self._memory.popitem(last=False)
+
+    def _file_path(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.json")
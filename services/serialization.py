@@ -0,0 +1,86 @@
+"""
+Serialization - Fast JSON encoding (orjson when installed, stdlib otherwise)
+"""
+from datetime import datetime
+from typing import Any
+import json
+
+from fastapi.responses import JSONResponse
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional speedup
+    orjson = None
+
+
+def _default(obj: Any) -> Any:
+    """stdlib fallback for types orjson handles natively"""
+    if isinstance(obj, datetime):
+        return obj.isoformat()
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def dumps_bytes(obj: Any, indent: bool = False) -> bytes:
+    """Serialize to UTF-8 JSON bytes"""
+    if orjson is not None:
+        return orjson.dumps(obj, option=orjson.OPT_INDENT_2 if indent else 0)
+    return dumps(obj, indent).encode("utf-8")
+
+
+def dumps(obj: Any, indent: bool = False) -> str:
+    """Serialize to a JSON string (non-ASCII characters are kept as-is)"""
+    if orjson is not None:
+        return dumps_bytes(obj, indent).decode("utf-8")
+    if indent:
+        return json.dumps(obj, ensure_ascii=False, indent=2, default=_default)
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":"), default=_default)
+
+
+def loads(data: Any) -> Any:
+    """Parse JSON from str or bytes"""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+class FastJSONResponse(JSONResponse):
+    """JSONResponse rendered with orjson when available"""
+
+    def render(self, content: Any) -> bytes:
+        return dumps_bytes(content)
+
+
+if __name__ == "__main__":
+    import timeit
+
+    # Roughly the shape of a large job's results payload
+    articles = [
+        {
+            "article_id": f"{i:032x}",
+            "title": f"Article {i} about quantum computing breakthroughs",
+            "link": f"https://example.com/news/{i}",
+            "description": "A fairly long description of the article, as returned by NewsData.io. " * 4,
+            "keywords": ["quantum", "computing", "research"],
+            "category": ["science", "technology"],
+            "relevance": "Very Relevant",
+            "reasoning": "Covers new developments in depth."
+        }
+        for i in range(1000)
+    ]
+    payload = {"job_id": "benchmark", "query": "quantum computing", "articles": articles}
+
+    runs = 50
+    stdlib_time = timeit.timeit(lambda: json.dumps(payload, ensure_ascii=False), number=runs) / runs
+    stdlib_indent_time = timeit.timeit(
+        lambda: json.dumps(payload, ensure_ascii=False, indent=2), number=runs
+    ) / runs
+    print(f"stdlib json.dumps:            {stdlib_time * 1000:8.2f} ms")
+    print(f"stdlib json.dumps(indent=2):  {stdlib_indent_time * 1000:8.2f} ms")
+
+    if orjson is None:
+        print("orjson not installed - using stdlib fallback")
+    else:
+        fast_time = timeit.timeit(lambda: dumps_bytes(payload), number=runs) / runs
+        fast_indent_time = timeit.timeit(lambda: dumps_bytes(payload, indent=True), number=runs) / runs
+        print(f"orjson dumps:                 {fast_time * 1000:8.2f} ms ({stdlib_time / fast_time:.1f}x)")
+        print(f"orjson dumps(indent):         {fast_indent_time * 1000:8.2f} ms ({stdlib_indent_time / fast_indent_time:.1f}x)")
@@ -0,0 +1,112 @@
+"""
+Token Budget - Pack articles into LLM chunks that fit the model's token limits
+"""
+from functools import lru_cache
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+import asyncio
+import logging
+import math
+
+logger = logging.getLogger(__name__)
+
+# Heuristic fallback: ~4 characters per token for English, less for German,
+# accents and URLs - 3 keeps estimates on the safe (over-counting) side
+CHARS_PER_TOKEN = 3.0
+
+# Estimates are approximate; leave headroom so a chunk never hits max_tokens
+BUDGET_FILL_RATIO = 0.85
+
+
+@lru_cache(maxsize=8)
+def _get_encoding(model: str):
+    """tiktoken encoding for the model, or None to use the heuristic"""
+    try:
+        import tiktoken
+    except ImportError:
+        return None
+
+    # Both calls may download BPE files on first use, so either can fail offline
+    try:
+        try:
+            return tiktoken.encoding_for_model(model)
+        except KeyError:
+            # Unknown (e.g. Azure deployment) names: assume a recent OpenAI tokenizer
+            return tiktoken.get_encoding("o200k_base")
+    except Exception as e:
+        logger.warning(f"tiktoken unavailable, estimating tokens from length: {str(e)}")
+        return None
+
+
+async def warm_encoding(model: str):
+    """Load (and possibly download) the encoding in a thread, off the event loop"""
+    await asyncio.to_thread(_get_encoding, model)
+
+
+def estimate_tokens(text: str, model: Optional[str] = None) -> int:
+    """Count tokens with tiktoken when installed, otherwise estimate from length"""
+    if not text:
+        return 0
+
+    encoding = _get_encoding(model) if model else None
+    if encoding is not None:
+        return len(encoding.encode(text, disallowed_special=()))
+    return math.ceil(len(text) / CHARS_PER_TOKEN)
+
+
+class TokenBudgetBatcher:
+    """Greedily pack articles into chunks under input/output token budgets"""
+
+    def __init__(self, cost: Callable[[Dict[str, Any]], Tuple[int, int]],
+                 max_input_tokens: int, max_output_tokens: int, max_articles: int):
+        self.cost = cost
+        self.max_input_tokens = max_input_tokens * BUDGET_FILL_RATIO
+        self.max_output_tokens = max_output_tokens * BUDGET_FILL_RATIO
+        self.max_articles = max(1, max_articles)
+        self._chunk: List[Dict[str, Any]] = []
+        self._input_tokens = 0
+        self._output_tokens = 0
+
+    def add(self, article: Dict[str, Any]) -> List[List[Dict[str, Any]]]:
+        """Add an article; returns the chunks that are complete, as soon as they are full"""
+        input_tokens, output_tokens = self.cost(article)
+        full = []
+
+        if self._chunk and (
+            self._input_tokens + input_tokens > self.max_input_tokens
+            or self._output_tokens + output_tokens > self.max_output_tokens
+        ):
+            full.append(self.flush())
+
+        # An oversized article still gets a chunk of its own
+        self._chunk.append(article)
+        self._input_tokens += input_tokens
+        self._output_tokens += output_tokens
+
+        # Emit now rather than waiting for an article that does not fit
+        if (
+            len(self._chunk) >= self.max_articles
+            or self._input_tokens >= self.max_input_tokens
+            or self._output_tokens >= self.max_output_tokens
+        ):
+            full.append(self.flush())
+        return full
+
+    def flush(self) -> Optional[List[Dict[str, Any]]]:
+        """Return the pending chunk (None if empty) and start a new one"""
+        if not self._chunk:
+            return None
+
+        chunk = self._chunk
+        self._chunk = []
+        self._input_tokens = 0
+        self._output_tokens = 0
+        return chunk
+
+    def pack(self, articles: Iterable[Dict[str, Any]]) -> Iterator[List[Dict[str, Any]]]:
+        """Pack a complete list of articles into chunks"""
+        for article in articles:
+            yield from self.add(article)
+
+        chunk = self.flush()
+        if chunk:
+            yield chunk
@@ -0,0 +1,161 @@
+"""
+Tests for AIAnalyzer response parsing and result matching
+"""
+import asyncio
+import json
+import unittest
+
+from services.ai_analyzer import AIAnalyzer, UNCLASSIFIED
+
+
+def make_analyzer() -> AIAnalyzer:
+    # A client is never called by these tests
+    return AIAnalyzer(client=object())
+
+
+def entry(article_id: int, relevance: str = "Relevant") -> str:
+    return json.dumps({"id": article_id, "relevance": relevance, "reasoning": "r"})
+
+
+class ExtractJsonTests(unittest.TestCase):
+
+    def setUp(self):
+        self.analyzer = make_analyzer()
+
+    def test_plain_array(self):
+        text = f"[{entry(1)}, {entry(2, 'Not Relevant')}]"
+        self.assertEqual([item["id"] for item in self.analyzer._extract_json(text)], [1, 2])
+
+    def test_wrapped_in_results_object_and_code_fence(self):
+        text = f'```json\n{{"results": [{entry(1)}, {entry(2)}]}}\n```'
+        self.assertEqual([item["id"] for item in self.analyzer._extract_json(text)], [1, 2])
+
+    def test_malformed_object_only_loses_itself(self):
+        text = f'{{"results": [{entry(1)}, {{"id": 2, "relevance": "Rel}}, {entry(3)}]}}'
+        self.assertEqual([item["id"] for item in self.analyzer._extract_json(text)], [1, 3])
+
+    def test_truncated_response_keeps_complete_objects(self):
+        text = f'{{"results": [{entry(1)}, {entry(2)}, {{"id": 3, "relev'
+        self.assertEqual([item["id"] for item in self.analyzer._extract_json(text)], [1, 2])
+
+    def test_no_json(self):
+        self.assertEqual(self.analyzer._extract_json("Sorry, I cannot help with that."), [])
+
+    def test_objects_without_relevance_are_ignored(self):
+        self.assertEqual(self.analyzer._extract_json('{"note": "nothing here"}'), [])
+
+
+class MatchResultsTests(unittest.TestCase):
+
+    def setUp(self):
+        self.analyzer = make_analyzer()
+        self.articles = [
+            {"article_id": f"a{i}", "link": f"https://example.com/{i}", "title": f"T{i}", "content": "x"}
+            for i in range(1, 4)
+        ]
+
+    def test_rejoins_article_fields_by_position(self):
+        classified = [{"id": "2", "relevance": "Very Relevant", "reasoning": "r"}]
+        matched, missing = self.analyzer._match_results(self.articles, classified)
+
+        self.assertEqual(len(matched), 1)
+        article, result = matched[0]
+        self.assertIs(article, self.articles[1])
+        self.assertEqual(result["link"], "https://example.com/2")
+        self.assertEqual(result["relevance"], "Very Relevant")
+        self.assertNotIn("content", result)
+        self.assertEqual([a["article_id"] for a in missing], ["a1", "a3"])
+
+    def test_unknown_ids_labels_and_duplicates_are_ignored(self):
+        classified = [
+            {"id": 1, "relevance": "Relevant"},
+            {"id": 1, "relevance": "Not Relevant"},
+            {"id": 2, "relevance": "Maybe"},
+            {"id": 9, "relevance": "Relevant"},
+            {"id": "x", "relevance": "Relevant"},
+        ]
+        matched, missing = self.analyzer._match_results(self.articles, classified)
+
+        self.assertEqual([result["relevance"] for _, result in matched], ["Relevant"])
+        self.assertEqual([a["article_id"] for a in missing], ["a2", "a3"])
+
+
+class ClassifyChunkTests(unittest.IsolatedAsyncioTestCase):
+
+    async def test_only_missing_articles_are_retried(self):
+        analyzer = make_analyzer()
+        articles = [{"article_id": f"a{i}", "link": f"l{i}"} for i in range(1, 5)]
+        sent = []
+
+        async def fake_analyze(chunk, system_prompt):
+            sent.append([a["article_id"] for a in chunk])
+            if len(sent) == 1:
+                return analyzer._extract_json(f"[{entry(1)}, {entry(3)}]")
+            return [json.loads(entry(1)), json.loads(entry(2))]
+
+        analyzer._analyze_chunk = fake_analyze
+        results = await analyzer._classify_chunk(articles, "", "q", None)
+
+        self.assertEqual(sent, [["a1", "a2", "a3", "a4"], ["a2", "a4"]])
+        self.assertEqual(sorted(r["article_id"] for r in results), ["a1", "a2", "a3", "a4"])
+
+    async def test_articles_are_never_dropped(self):
+        analyzer = make_analyzer()
+        articles = [{"article_id": "a1", "link": "l1"}, {"article_id": "a2", "link": "l2"}]
+
+        async def fake_analyze(chunk, system_prompt):
+            # The retry (a2 alone, as id 1) comes back empty
+            return [json.loads(entry(1))] if len(chunk) == 2 else []
+
+        analyzer._analyze_chunk = fake_analyze
+        results = await analyzer._classify_chunk(articles, "", "q", None)
+
+        self.assertEqual({r["article_id"]: r["relevance"] for r in results}, {"a1": "Relevant", "a2": UNCLASSIFIED})
+
+
+class AnalyzeStreamTests(unittest.IsolatedAsyncioTestCase):
+
+    async def classify(self, chunk, system_prompt, query, extra_topics):
+        await asyncio.sleep(0)
+        return [{"article_id": a["article_id"], "relevance": "Relevant"} for a in chunk]
+
+    async def test_progress_is_reported_from_the_first_chunk(self):
+        analyzer = make_analyzer()
+        analyzer._classify_chunk = self.classify
+        progress = []
+
+        async def pages():
+            for page in range(3):
+                yield [{"article_id": f"{page}-{i}", "link": f"l{page}-{i}"} for i in range(4)]
+                # Let the analyzers catch up, as they do while the next page downloads
+                await asyncio.sleep(0.01)
+
+        async def on_progress(completed, total):
+            progress.append((completed, total))
+
+        results = await analyzer.analyze_stream(pages(), "q", chunk_size=4, max_concurrency=2,
+                                                progress_callback=on_progress)
+
+        self.assertEqual(len(results), 12)
+        self.assertEqual(progress[0], (0, None))
+        self.assertIn((1, None), progress)
+        self.assertEqual(progress[-1], (3, 3))
+
+    async def test_analyze_articles_runs_as_a_single_page_stream(self):
+        analyzer = make_analyzer()
+        analyzer._classify_chunk = self.classify
+        chunks = []
+
+        async def on_chunk(index, classified):
+            chunks.append((index, len(classified)))
+
+        articles = [{"article_id": f"a{i}", "link": f"l{i}"} for i in range(10)]
+        results = await analyzer.analyze_articles(articles, "q", chunk_size=4, max_concurrency=3,
+                                                  chunk_callback=on_chunk)
+
+        self.assertEqual(sorted(r["article_id"] for r in results), sorted(a["article_id"] for a in articles))
+        self.assertEqual(sorted(chunks), [(0, 4), (1, 4), (2, 2)])
+
+
+if __name__ == "__main__":
+    unittest.main()
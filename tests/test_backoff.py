@@ -0,0 +1,97 @@
+"""
+Tests for retry delays, Retry-After parsing and the AIMD concurrency limiter
+"""
+from datetime import datetime, timedelta, timezone
+from email.utils import format_datetime
+import asyncio
+import unittest
+
+from services.backoff import AdaptiveConcurrencyLimiter, backoff_delay, retry_after_seconds, retry_delay
+
+
+class RetryAfterTests(unittest.TestCase):
+
+    def test_missing(self):
+        self.assertIsNone(retry_after_seconds(None))
+        self.assertIsNone(retry_after_seconds({}))
+
+    def test_seconds(self):
+        self.assertEqual(retry_after_seconds({"retry-after": "7"}), 7.0)
+
+    def test_milliseconds_take_precedence(self):
+        self.assertEqual(retry_after_seconds({"retry-after-ms": "1500", "retry-after": "7"}), 1.5)
+
+    def test_http_date(self):
+        retry_at = datetime.now(timezone.utc) + timedelta(seconds=30)
+        seconds = retry_after_seconds({"retry-after": format_datetime(retry_at, usegmt=True)})
+        self.assertAlmostEqual(seconds, 30, delta=2)
+
+    def test_past_date_and_garbage(self):
+        self.assertEqual(retry_after_seconds({"retry-after": "Wed, 21 Oct 2015 07:28:00 GMT"}), 0.0)
+        self.assertIsNone(retry_after_seconds({"retry-after": "soon"}))
+
+
+class RetryDelayTests(unittest.TestCase):
+
+    def test_backoff_is_jittered_and_capped(self):
+        for attempt in range(10):
+            delay = backoff_delay(attempt, base_delay=1.0, max_delay=8.0)
+            self.assertGreaterEqual(delay, 0)
+            self.assertLessEqual(delay, min(8.0, 2 ** attempt))
+
+    def test_retry_after_is_honoured_with_jitter(self):
+        delay = retry_delay(0, {"retry-after": "5"}, base_delay=1.0, max_delay=60.0)
+        self.assertGreaterEqual(delay, 5.0)
+        self.assertLessEqual(delay, 6.0)
+
+    def test_retry_after_is_capped(self):
+        self.assertEqual(retry_delay(0, {"retry-after": "3600"}, base_delay=1.0, max_delay=60.0), 60.0)
+
+
+class AdaptiveConcurrencyLimiterTests(unittest.IsolatedAsyncioTestCase):
+
+    async def test_limits_concurrency(self):
+        limiter = AdaptiveConcurrencyLimiter(3)
+        running = peak = 0
+
+        async def call():
+            nonlocal running, peak
+            async with limiter:
+                running += 1
+                peak = max(peak, running)
+                await asyncio.sleep(0.01)
+                running -= 1
+
+        await asyncio.gather(*(call() for _ in range(10)))
+        self.assertEqual(peak, 3)
+
+    async def test_throttle_halves_once_per_cooldown(self):
+        limiter = AdaptiveConcurrencyLimiter(8, decrease_cooldown=60.0)
+        limiter.on_throttle()
+        limiter.on_throttle()
+        self.assertEqual(limiter.limit, 4.0)
+
+        limiter._last_decrease = 0.0
+        limiter.on_throttle()
+        self.assertEqual(limiter.limit, 2.0)
+
+    async def test_never_below_min_or_above_max(self):
+        limiter = AdaptiveConcurrencyLimiter(4, decrease_cooldown=0.0)
+        for _ in range(5):
+            limiter.on_throttle()
+        self.assertEqual(limiter.limit, 1.0)
+
+        for _ in range(100):
+            limiter.on_success()
+        self.assertEqual(limiter.limit, 4.0)
+
+    async def test_additive_increase(self):
+        limiter = AdaptiveConcurrencyLimiter(8, decrease_cooldown=0.0)
+        limiter.on_throttle()
+        for _ in range(4):
+            limiter.on_success()
+        self.assertAlmostEqual(limiter.limit, 5.0, delta=0.1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,61 @@
+"""
+Tests for JobManager's cleanup of deleted and evicted jobs
+"""
+import os
+import tempfile
+import unittest
+
+from services.job_manager import JobManager
+from services.job_store import FileJobStore
+from tests.test_job_store import make_job
+
+
+class JobCleanupTests(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        # JobManager renders exports relative to the working directory
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        cwd = os.getcwd()
+        os.chdir(self.tmp.name)
+        self.addCleanup(os.chdir, cwd)
+
+        self.store = FileJobStore(results_dir="results", max_jobs=2)
+        self.manager = JobManager(store=self.store)
+        self.addCleanup(self.manager.close)
+
+    def add_export(self, job_id: str):
+        with open(f"results/{job_id}.xlsx", "w") as f:
+            f.write("xlsx")
+        self.manager._export_versions[(job_id, "xlsx")] = "v1"
+
+    async def test_eviction_cleans_up_exports_and_notifies_watchers(self):
+        self.store.save(make_job("j1", minutes_ago=3))
+        self.add_export("j1")
+        queue = self.manager.subscribe("j1")
+
+        self.store.save(make_job("j2", minutes_ago=2))
+        self.store.save(make_job("j3", minutes_ago=1))
+        self.store.close()
+
+        self.assertIsNone(self.manager.get_job("j1"))
+        self.assertFalse(os.path.exists("results/j1.xlsx"))
+        self.assertFalse(os.path.exists("results/j1.json"))
+        self.assertNotIn(("j1", "xlsx"), self.manager._export_versions)
+        self.assertEqual(queue.get_nowait(), ("deleted", {"job_id": "j1"}))
+        self.assertEqual(sorted(os.listdir("results")), ["j2.json", "j3.json", "manifest.jsonl"])
+
+    async def test_delete_job_removes_the_export(self):
+        self.store.save(make_job("j1"))
+        self.add_export("j1")
+
+        self.assertTrue(self.manager.delete_job("j1"))
+        self.store.close()
+
+        self.assertFalse(os.path.exists("results/j1.xlsx"))
+        self.assertEqual(os.listdir("results"), ["manifest.jsonl"])
+        self.assertFalse(self.manager.delete_job("j1"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,223 @@
+"""
+Tests for the job store backends
+"""
+from datetime import datetime, timedelta
+import os
+import tempfile
+import time
+import unittest
+
+from models import JobStatus
+from services import serialization
+from services.job_store import (
+    FileJobStore, JobStore, SQLiteJobStore, create_job_store, migrate_results, read_result_data, write_result_data
+)
+
+
+def make_job(job_id: str, articles: int = 3, minutes_ago: int = 0) -> JobStatus:
+    timestamp = datetime.now() - timedelta(minutes=minutes_ago)
+    return JobStatus(
+        job_id=job_id,
+        status="completed",
+        progress=100,
+        created_at=timestamp,
+        updated_at=timestamp,
+        query="energy",
+        total_articles=articles,
+        results=[
+            {"link": f"https://example.com/{job_id}/{i}", "relevance": "Relevant" if i % 2 else "Not Relevant"}
+            for i in range(articles)
+        ]
+    )
+
+
+class JobStoreInterfaceTests(unittest.TestCase):
+
+    def test_incomplete_backend_cannot_be_constructed(self):
+        class ReadOnlyStore(JobStore):
+            def get(self, job_id, include_results=True):
+                return None
+
+        with self.assertRaises(TypeError):
+            ReadOnlyStore()
+
+
+class FileJobStoreTests(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.results_dir = self.tmp.name
+
+    def open_store(self, **kwargs) -> FileJobStore:
+        store = FileJobStore(results_dir=self.results_dir, **kwargs)
+        self.addCleanup(store.close)
+        return store
+
+    def manifest_ids(self):
+        with open(os.path.join(self.results_dir, FileJobStore.MANIFEST_FILENAME)) as f:
+            return sorted(serialization.loads(line)["job_id"] for line in f if line.strip())
+
+    def test_save_reopen_and_lazy_load(self):
+        store = self.open_store()
+        store.save(make_job("a"))
+        store.close()
+
+        reopened = self.open_store(body_cache_size=0)
+        self.assertEqual(reopened.get("a", include_results=False).total_articles, 3)
+        self.assertEqual([a["link"] for a in reopened.get("a").results], [f"https://example.com/a/{i}" for i in range(3)])
+        self.assertEqual(len(list(reopened.iter_results("a", ["Relevant"]))), 1)
+
+    def test_manifest_is_rebuilt_for_unindexed_and_missing_files(self):
+        store = self.open_store()
+        store.save(make_job("a"))
+        store.save(make_job("b"))
+        store.close()
+
+        # Written by an older version (not in the manifest) and one file removed by hand
+        write_result_data(
+            os.path.join(self.results_dir, "legacy.json"),
+            {"job_id": "legacy", "query": "old", "total_articles": 1, "articles": [{"link": "l"}]}
+        )
+        os.remove(os.path.join(self.results_dir, "b.json"))
+
+        reopened = self.open_store()
+        reopened.close()
+        self.assertEqual(sorted(job.job_id for job in reopened.list_jobs()), ["a", "legacy"])
+        self.assertEqual(self.manifest_ids(), ["a", "legacy"])
+        self.assertEqual(reopened.get("legacy").query, "old")
+
+    def test_delete_then_get(self):
+        store = self.open_store()
+        store.save(make_job("a"))
+        store.save(make_job("b"))
+
+        self.assertTrue(store.delete("a"))
+        self.assertIsNone(store.get("a"))
+        self.assertFalse(store.delete("a"))
+        store.close()
+
+        self.assertFalse(os.path.exists(os.path.join(self.results_dir, "a.json")))
+        self.assertEqual(self.manifest_ids(), ["b"])
+        self.assertIsNone(self.open_store().get("a"))
+
+    def test_ndjson_gz_round_trip(self):
+        store = self.open_store(results_format="ndjson.gz")
+        store.save(make_job("a"))
+        store.close()
+
+        self.assertEqual(os.listdir(self.results_dir).count("a.ndjson.gz"), 1)
+        self.assertEqual(len(self.open_store(results_format="ndjson.gz").get("a").results), 3)
+
+
+class MigrateResultsTests(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.results_dir = self.tmp.name
+
+        store = FileJobStore(results_dir=self.results_dir)
+        store.save(make_job("a"))
+        store.save(make_job("b", articles=5))
+        store.close()
+        self.original = read_result_data(os.path.join(self.results_dir, "a.json"))
+
+    def test_json_to_ndjson_gz_and_load(self):
+        json_path = os.path.join(self.results_dir, "a.json")
+        os.utime(json_path, (1_600_000_000, 1_600_000_000))
+
+        self.assertEqual(migrate_results(self.results_dir, "ndjson.gz"), 2)
+
+        gz_path = os.path.join(self.results_dir, "a.ndjson.gz")
+        self.assertFalse(os.path.exists(json_path))
+        self.assertEqual(read_result_data(gz_path), self.original)
+        self.assertEqual(os.path.getmtime(gz_path), 1_600_000_000)
+
+        store = FileJobStore(results_dir=self.results_dir, results_format="ndjson.gz")
+        self.addCleanup(store.close)
+        self.assertEqual(store.get("a").results, self.original["articles"])
+        self.assertEqual(len(store.get("b").results), 5)
+
+    def test_round_trip_back_to_json(self):
+        migrate_results(self.results_dir, "ndjson.gz")
+        self.assertEqual(migrate_results(self.results_dir, "json"), 2)
+        self.assertEqual(migrate_results(self.results_dir, "json"), 0)
+        self.assertEqual(read_result_data(os.path.join(self.results_dir, "a.json")), self.original)
+
+    def test_unreadable_file_is_kept(self):
+        broken = os.path.join(self.results_dir, "broken.json")
+        with open(broken, "w") as f:
+            f.write("{not json")
+
+        self.assertEqual(migrate_results(self.results_dir, "ndjson.gz"), 2)
+        self.assertTrue(os.path.exists(broken))
+        self.assertFalse(os.path.exists(os.path.join(self.results_dir, "broken.ndjson.gz")))
+
+
+class SQLiteJobStoreTests(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.path = os.path.join(self.tmp.name, "jobs.db")
+        self.store = SQLiteJobStore(self.path)
+        self.addCleanup(self.store.close)
+
+    def flush(self):
+        self.store._writer.submit(lambda: None).result()
+
+    def test_save_then_get(self):
+        self.store.save(make_job("a"))
+        self.assertEqual(len(self.store.get("a").results), 3)
+
+        self.flush()
+        self.assertEqual(len(self.store.get("a").results), 3)
+        self.assertIsNone(self.store.get("a", include_results=False).results)
+        self.assertEqual([a["link"] for a in self.store.iter_results("a", ["Relevant"])], ["https://example.com/a/1"])
+
+    def test_delete_hides_a_committed_job_before_the_delete_commits(self):
+        self.store.save(make_job("a"))
+        self.flush()
+
+        # Hold the writer so the DELETE is still queued
+        gate = self.store._writer.submit(time.sleep, 0.2)
+        self.assertTrue(self.store.delete("a"))
+        self.assertFalse(gate.done())
+
+        self.assertIsNone(self.store.get("a"))
+        self.assertEqual(self.store.list_jobs(), [])
+        self.assertEqual(list(self.store.iter_results("a")), [])
+        self.assertFalse(self.store.delete("a"))
+
+    def test_delete_persists(self):
+        self.store.save(make_job("a"))
+        self.store.save(make_job("b"))
+        self.assertTrue(self.store.delete("a"))
+        self.store.close()
+
+        reopened = SQLiteJobStore(self.path)
+        self.addCleanup(reopened.close)
+        self.assertIsNone(reopened.get("a"))
+        self.assertEqual([job.job_id for job in reopened.list_jobs()], ["b"])
+
+    def test_save_after_delete_is_visible(self):
+        self.store.save(make_job("a"))
+        self.store.delete("a")
+        self.store.save(make_job("a", articles=1))
+        self.flush()
+        self.assertEqual(len(self.store.get("a").results), 1)
+
+    def test_result_files_are_imported_into_an_empty_database(self):
+        results_dir = os.path.join(self.tmp.name, "results")
+        files = FileJobStore(results_dir=results_dir, results_format="ndjson.gz")
+        files.save(make_job("a"))
+        files.close()
+
+        store = create_job_store("sqlite", results_dir=results_dir, sqlite_path=os.path.join(self.tmp.name, "new.db"))
+        self.addCleanup(store.close)
+        self.assertEqual(len(store.get("a").results), 3)
+
+
+if __name__ == "__main__":
+    unittest.main()
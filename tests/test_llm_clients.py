@@ -0,0 +1,54 @@
+"""
+Tests for the pooled LLM client registry
+"""
+import asyncio
+import unittest
+
+from services.llm_clients import LLMClientRegistry
+
+
+class FakeClient:
+
+    def __init__(self):
+        self.closed = False
+
+    async def close(self):
+        self.closed = True
+
+
+class LLMClientRegistryTests(unittest.IsolatedAsyncioTestCase):
+
+    async def asyncSetUp(self):
+        self.registry = LLMClientRegistry(idle_timeout=0.05, max_concurrency=3)
+        self.registry._create_client = lambda *args: FakeClient()
+        self.addAsyncCleanup(self.registry.close)
+
+    async def test_same_credentials_share_client_and_limiter(self):
+        async with self.registry.lease("key-1") as first, self.registry.lease("key-1") as second:
+            self.assertIs(first, second)
+            self.assertEqual(first.limiter.max_limit, 3)
+        async with self.registry.lease("key-2") as other:
+            self.assertIsNot(other, first)
+
+    async def test_idle_clients_are_closed_without_new_leases(self):
+        self.registry.start()
+        async with self.registry.lease("key-1") as entry:
+            await asyncio.sleep(0.15)
+            self.assertFalse(entry.client.closed)
+
+        await asyncio.sleep(0.15)
+        self.assertTrue(entry.client.closed)
+        self.assertEqual(self.registry._clients, {})
+
+    async def test_close_stops_eviction_and_closes_clients(self):
+        self.registry.start()
+        async with self.registry.lease("key-1") as entry:
+            pass
+
+        await self.registry.close()
+        self.assertTrue(entry.client.closed)
+        self.assertIsNone(self.registry._evict_task)
+
+
+if __name__ == "__main__":
+    unittest.main()
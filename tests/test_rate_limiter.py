@@ -0,0 +1,132 @@
+"""
+Tests for the per-key NewsData.io token bucket
+"""
+import asyncio
+import time
+import unittest
+
+from services.rate_limiter import FairTokenBucket, RateLimiterRegistry
+
+
+class FairTokenBucketTests(unittest.IsolatedAsyncioTestCase):
+
+    async def test_burst_is_immediate(self):
+        bucket = FairTokenBucket(rate=1.0, capacity=3)
+        started = time.monotonic()
+        for _ in range(3):
+            await bucket.acquire("job")
+        self.assertLess(time.monotonic() - started, 0.05)
+
+    async def test_waits_for_refill(self):
+        bucket = FairTokenBucket(rate=20.0, capacity=1)
+        await bucket.acquire("job")
+        started = time.monotonic()
+        await bucket.acquire("job")
+        self.assertGreaterEqual(time.monotonic() - started, 0.04)
+
+    async def test_later_job_is_not_stuck_behind_a_queued_burst(self):
+        bucket = FairTokenBucket(rate=200.0, capacity=1)
+        await bucket.acquire("warmup")
+        order = []
+
+        async def request(name: str):
+            await bucket.acquire(name)
+            order.append(name)
+
+        # "a" queues six requests before "b" asks for its first
+        burst = [asyncio.create_task(request("a")) for _ in range(6)]
+        await asyncio.sleep(0)
+        await request("b")
+        await request("b")
+        await asyncio.gather(*burst)
+
+        # FIFO would give aaaaaabb
+        self.assertEqual("".join(order), "ababaaaa")
+
+    async def test_interleaves_sequential_jobs(self):
+        bucket = FairTokenBucket(rate=200.0, capacity=1)
+        await bucket.acquire("warmup")
+        order = []
+
+        async def job(name: str, requests: int):
+            for _ in range(requests):
+                await bucket.acquire(name)
+                order.append(name)
+
+        await asyncio.gather(job("a", 4), job("b", 4))
+        self.assertEqual("".join(order), "abababab")
+
+    async def test_penalize_pauses_and_keeps_one_probe_token(self):
+        bucket = FairTokenBucket(rate=1000.0, capacity=10)
+        bucket.penalize(0.1)
+        self.assertLessEqual(bucket.tokens, 1.0)
+
+        started = time.monotonic()
+        await bucket.acquire("job")
+        self.assertGreaterEqual(time.monotonic() - started, 0.09)
+
+    async def test_cancelled_waiter_does_not_consume_a_token(self):
+        bucket = FairTokenBucket(rate=20.0, capacity=1)
+        await bucket.acquire("job")
+
+        waiter = asyncio.create_task(bucket.acquire("cancelled"))
+        await asyncio.sleep(0)
+        waiter.cancel()
+        with self.assertRaises(asyncio.CancelledError):
+            await waiter
+
+        # The next waiter gets the refilled token instead of waiting a second interval
+        started = time.monotonic()
+        await bucket.acquire("job")
+        self.assertLess(time.monotonic() - started, 0.09)
+        self.assertEqual(bucket.waiting, 0)
+
+
+class RateLimiterRegistryTests(unittest.TestCase):
+
+    def test_at_most_n_grants_in_any_window(self):
+        requests, window = 5, 0.3
+        bucket = RateLimiterRegistry(requests=requests, window_seconds=window, burst=3).get("key")
+        grants = []
+
+        async def run():
+            deadline = time.monotonic() + 3 * window
+            while time.monotonic() < deadline:
+                await bucket.acquire("job")
+                grants.append(time.monotonic())
+
+        asyncio.run(run())
+        for start in grants:
+            in_window = [t for t in grants if start <= t < start + window]
+            self.assertLessEqual(len(in_window), requests)
+        # The burst goes out immediately
+        self.assertLess(grants[2] - grants[0], 0.01)
+
+    def test_one_bucket_per_key(self):
+        registry = RateLimiterRegistry(requests=30, window_seconds=900)
+        self.assertIs(registry.get("key-1"), registry.get("key-1"))
+        self.assertIsNot(registry.get("key-1"), registry.get("key-2"))
+        self.assertEqual(registry.get("key-1").capacity, 10)
+        self.assertAlmostEqual(registry.get("key-1").rate, 20 / 900)
+
+    def test_burst_never_exceeds_the_limit(self):
+        registry = RateLimiterRegistry(requests=5, window_seconds=900, burst=50)
+        self.assertEqual(registry.capacity, 4)
+        self.assertAlmostEqual(registry.capacity + registry.rate * 900, 5)
+        with self.assertRaises(ValueError):
+            RateLimiterRegistry(requests=1, window_seconds=900)
+
+    def test_idle_buckets_are_evicted_at_capacity(self):
+        registry = RateLimiterRegistry(requests=5, window_seconds=1, max_buckets=2)
+        busy = registry.get("busy")
+        busy.tokens = 0
+        busy.rate = 1e-9
+        registry.get("idle")
+        registry.get("new")
+
+        self.assertEqual(len(registry._buckets), 2)
+        self.assertIs(registry.get("busy"), busy)
+
+
+if __name__ == "__main__":
+    unittest.main()
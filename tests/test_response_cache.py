@@ -0,0 +1,83 @@
+"""
+Tests for the NewsData.io response cache and its single-flight coalescing
+"""
+import asyncio
+import os
+import tempfile
+import time
+import unittest
+
+from services.response_cache import ResponseCache
+
+URL = "https://newsdata.io/api/1/latest"
+
+
+def params(apikey: str, page: str = None):
+    return {"apikey": apikey, "q": "energy", "page": page}
+
+
+class ResponseCacheTests(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.cache = ResponseCache(directory=self.tmp.name, ttl_seconds=60)
+        self.calls = []
+
+    def fetcher(self, apikey: str, delay: float = 0.02):
+        async def fetch():
+            self.calls.append(apikey)
+            await asyncio.sleep(delay)
+            if apikey == "bad":
+                raise Exception("HTTP 401")
+            return {"status": "success", "results": [{"link": "l1"}]}
+        return fetch
+
+    async def test_same_key_requests_are_coalesced(self):
+        results = await asyncio.gather(*(
+            self.cache.get_or_fetch(URL, params("good"), self.fetcher("good")) for _ in range(3)
+        ))
+        self.assertEqual(self.calls, ["good"])
+        self.assertTrue(all(r == results[0] for r in results))
+
+    async def test_bad_key_does_not_fail_a_concurrent_good_key(self):
+        bad = self.cache.get_or_fetch(URL, params("bad"), self.fetcher("bad"))
+        good = self.cache.get_or_fetch(URL, params("good"), self.fetcher("good"))
+        bad_result, good_result = await asyncio.gather(bad, good, return_exceptions=True)
+
+        self.assertIsInstance(bad_result, Exception)
+        self.assertEqual(good_result["status"], "success")
+        self.assertEqual(sorted(self.calls), ["bad", "good"])
+
+    async def test_cached_pages_are_shared_across_keys(self):
+        await self.cache.get_or_fetch(URL, params("key-1"), self.fetcher("key-1"))
+        data = await self.cache.get_or_fetch(URL, params("key-2"), self.fetcher("key-2"))
+
+        self.assertEqual(self.calls, ["key-1"])
+        self.assertEqual(data["status"], "success")
+
+    async def test_errors_are_not_cached(self):
+        with self.assertRaises(Exception):
+            await self.cache.get_or_fetch(URL, params("bad"), self.fetcher("bad"))
+        await self.cache.get_or_fetch(URL, params("good"), self.fetcher("good"))
+        self.assertEqual(self.calls, ["bad", "good"])
+
+    async def test_entries_survive_a_restart(self):
+        await self.cache.get_or_fetch(URL, params("good", "p2"), self.fetcher("good"))
+        reopened = ResponseCache(directory=self.tmp.name, ttl_seconds=60)
+        await reopened.get_or_fetch(URL, params("other", "p2"), self.fetcher("other"))
+        self.assertEqual(self.calls, ["good"])
+
+    def test_prune_removes_expired_files(self):
+        path = os.path.join(self.tmp.name, "stale.json")
+        with open(path, "w") as f:
+            f.write("{}")
+        old = time.time() - 120
+        os.utime(path, (old, old))
+
+        self.cache.prune()
+        self.assertFalse(os.path.exists(path))
+
+
+if __name__ == "__main__":
+    unittest.main()
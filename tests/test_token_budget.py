@@ -0,0 +1,82 @@
+"""
+Tests for token estimation and budget-based chunk packing
+"""
+import sys
+import types
+import unittest
+from unittest import mock
+
+from services import token_budget
+from services.token_budget import TokenBudgetBatcher, estimate_tokens
+
+
+def articles(count: int, input_tokens: int = 10, output_tokens: int = 10):
+    return [{"id": i, "cost": (input_tokens, output_tokens)} for i in range(count)]
+
+
+def batcher(max_input: float = 1000, max_output: float = 1000, max_articles: int = 15) -> TokenBudgetBatcher:
+    # Undo the fill ratio so budgets in tests are exact
+    ratio = token_budget.BUDGET_FILL_RATIO
+    return TokenBudgetBatcher(
+        lambda article: article["cost"],
+        max_input_tokens=max_input / ratio,
+        max_output_tokens=max_output / ratio,
+        max_articles=max_articles
+    )
+
+
+class TokenBudgetBatcherTests(unittest.TestCase):
+
+    def test_chunk_is_emitted_as_soon_as_it_is_full(self):
+        b = batcher(max_articles=3)
+        emitted = [b.add(article) for article in articles(3)]
+
+        self.assertEqual(emitted[:2], [[], []])
+        self.assertEqual([[a["id"] for a in chunk] for chunk in emitted[2]], [[0, 1, 2]])
+        self.assertIsNone(b.flush())
+
+    def test_output_budget(self):
+        chunks = list(batcher(max_output=100, max_articles=50).pack(articles(25, output_tokens=30)))
+        self.assertEqual([len(chunk) for chunk in chunks], [3] * 8 + [1])
+
+    def test_input_budget(self):
+        chunks = list(batcher(max_input=50).pack(articles(10, input_tokens=20)))
+        self.assertEqual([len(chunk) for chunk in chunks], [2] * 5)
+
+    def test_oversized_article_gets_its_own_chunk(self):
+        items = articles(2) + [{"id": "big", "cost": (5000, 10)}] + articles(2)
+        chunks = list(batcher(max_input=100).pack(items))
+        self.assertEqual([len(chunk) for chunk in chunks], [2, 1, 2])
+
+    def test_pack_keeps_order_and_every_article(self):
+        items = articles(40)
+        chunks = list(batcher(max_articles=15).pack(items))
+        self.assertEqual([a["id"] for chunk in chunks for a in chunk], list(range(40)))
+        self.assertEqual([len(chunk) for chunk in chunks], [15, 15, 10])
+
+
+class EstimateTokensTests(unittest.TestCase):
+
+    def setUp(self):
+        token_budget._get_encoding.cache_clear()
+        self.addCleanup(token_budget._get_encoding.cache_clear)
+
+    def test_heuristic_without_tiktoken(self):
+        with mock.patch.dict(sys.modules, {"tiktoken": None}):
+            self.assertEqual(estimate_tokens("x" * 30, "gpt-4o-mini"), 10)
+            self.assertEqual(estimate_tokens("", "gpt-4o-mini"), 0)
+
+    def test_failed_encoding_download_falls_back_to_heuristic(self):
+        def unavailable(*args, **kwargs):
+            raise ConnectionError("no network")
+
+        def unknown_model(model):
+            raise KeyError(model)
+
+        fake = types.SimpleNamespace(encoding_for_model=unknown_model, get_encoding=unavailable)
+        with mock.patch.dict(sys.modules, {"tiktoken": fake}):
+            self.assertEqual(estimate_tokens("x" * 30, "my-azure-deployment"), 10)
+
+
+if __name__ == "__main__":
+    unittest.main()